@@ -0,0 +1,116 @@
+#
+# Fetch The Weather: Weather stations
+# Adaptive sampling interval
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+import json, machine
+
+class Battery:
+    """Battery voltage measured through a divider on an ADC pin
+
+    low() has a hysteresis of hysteresis volts, so a voltage hovering
+    around low_volts does not switch low battery mode on every reading.
+    """
+
+    def __init__(self, pin, divider=2.0, low_volts=3.5, hysteresis=0.1, vref=3.3):
+        self.adc = machine.ADC(machine.Pin(pin))
+        self.divider = divider
+        self.low_volts = low_volts
+        self.hysteresis = hysteresis
+        self.vref = vref
+        self.samples = [0] * 5
+
+    def volts(self):
+        # Median of a few reads drops the glitches of the ESP32 ADC
+        for i in range(len(self.samples)):
+            self.samples[i] = self.adc.read_u16()
+        self.samples.sort()
+        return self.samples[len(self.samples) // 2] * self.vref / 65535 * self.divider
+
+    def low(self, was_low=False):
+        if was_low:
+            return self.volts() < self.low_volts + self.hysteresis
+        return self.volts() < self.low_volts
+
+class Adaptive:
+    """Picks the time until the next reading from how fast the readings change
+
+    change maps record fields to {"abs": ..., "rel": ...} like the report
+    deadbands, the larger of the two is the change of a field worth a
+    reading of its own. The interval is the time the fastest moving field
+    takes to change by that much at the rate seen between the last two
+    readings. A field that moved by more than its change narrows the
+    interval at once, a quiet signal widens it by at most grow per reading,
+    always within min_interval and max_interval. While battery reports a
+    low battery the interval is at least low_interval.
+    """
+
+    def __init__(self, change, min_interval=15, max_interval=600, interval=60, grow=1.5, low_interval=300, battery=None):
+        self.change = change
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.grow = grow
+        self.low_interval = low_interval
+        self.battery = battery
+        self.low = False # Low battery mode
+        self.last = {} # Field: value of the last reading
+        self.last_time = None
+        self.extra = None # State of other parts of the station saved along, see save()
+        self.interval = self.clamp(interval)
+
+    def clamp(self, interval):
+        shortest = self.min_interval
+        if self.low:
+            shortest = max(shortest, min(self.low_interval, self.max_interval))
+        return int(max(shortest, min(self.max_interval, interval)))
+
+    def update(self, record):
+        """Takes a reading and returns the seconds until the next one"""
+        if self.battery != None:
+            low = self.battery.low(self.low)
+            if low != self.low:
+                print("WARNING: Battery low, sampling less often" if low else "INFO: Battery recovered")
+                self.low = low
+        timestamp = record["timestamp"]
+        target = self.interval * self.grow
+        if self.last_time != None and timestamp > self.last_time:
+            elapsed = timestamp - self.last_time
+            for field in self.change:
+                value = record.get(field)
+                last = self.last.get(field)
+                if value == None or last == None or value == last:
+                    continue
+                band = self.change[field]
+                step = max(band.get("abs", 0), band.get("rel", 0) * abs(value))
+                target = min(target, step * elapsed / abs(value - last))
+        for field in self.change:
+            self.last[field] = record.get(field)
+        self.last_time = timestamp
+        self.interval = self.clamp(target)
+        return self.interval
+
+    def save(self, extra=None):
+        """Keeps the state in RTC memory across deep sleep, returns False without one
+
+        extra is any JSON state of other parts of the station, restore()
+        puts it back in self.extra.
+        """
+        try:
+            machine.RTC().memory(json.dumps([self.interval, self.last_time, self.low, self.last, extra]).encode())
+        except (AttributeError, OSError, ValueError):
+            return False
+        return True
+
+    def restore(self):
+        """Loads the state saved before deep sleep, returns False when there is none"""
+        try:
+            interval, self.last_time, self.low, self.last, self.extra = json.loads(machine.RTC().memory())
+        except (AttributeError, OSError, ValueError, TypeError):
+            return False
+        self.interval = self.clamp(interval)
+        return True
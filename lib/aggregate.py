@@ -0,0 +1,79 @@
+#
+# Fetch The Weather: Weather stations
+# Windowed reading aggregation
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+from math import sqrt
+
+class Welford:
+    """Streaming count, min, max, mean and standard deviation in constant memory"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0 # Sum of squared differences from the mean
+        self.min = None
+        self.max = None
+
+    def add(self, x):
+        self.count = self.count + 1
+        delta = x - self.mean
+        self.mean = self.mean + delta / self.count
+        self.m2 = self.m2 + delta * (x - self.mean)
+        if self.min == None or x < self.min:
+            self.min = x
+        if self.max == None or x > self.max:
+            self.max = x
+
+    def stddev(self):
+        # Sample standard deviation
+        if self.count < 2:
+            return 0.0
+        return sqrt(self.m2 / (self.count - 1))
+
+class Aggregator:
+    """Summarizes every sensor read of a reporting window per field
+
+    add() takes the values returned by one driver read, summary() returns
+    {field: [count, min, max, mean, stddev]} for the fields read since the
+    last summary and starts a new window. The accumulators are kept and
+    reused, so memory does not grow with the sampling rate. invalid maps
+    fields to the value a sensor reports for a failed reading, such reads
+    are left out of the window.
+    """
+
+    def __init__(self, digits=2, invalid=None):
+        self.fields = {} # Field name: Welford
+        self.digits = digits
+        self.invalid = invalid or {}
+
+    def add(self, values):
+        for name in values:
+            value = values[name]
+            if type(value) is not int and type(value) is not float:
+                continue
+            if value == self.invalid.get(name):
+                continue
+            acc = self.fields.get(name)
+            if acc == None:
+                acc = self.fields[name] = Welford()
+            acc.add(value)
+
+    def summary(self):
+        stats = {}
+        for name in self.fields:
+            acc = self.fields[name]
+            if acc.count == 0:
+                continue
+            digits = self.digits
+            stats[name] = [acc.count, round(acc.min, digits), round(acc.max, digits), round(acc.mean, digits), round(acc.stddev(), digits)]
+            acc.reset()
+        return stats
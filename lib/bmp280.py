@@ -1,5 +1,7 @@
 from micropython import const
-from ustruct import unpack as unp
+from ustruct import unpack_from
+from array import array
+from ticks import ticks_ms, ticks_diff, sleep_ms
 
 # Author David Stenwall (david at stenwall.io)
 
@@ -76,6 +78,7 @@ _BMP280_CASE_MATRIX = [
     [BMP280_POWER_NORMAL, BMP280_OS_ULTRAHIGH, BMP280_IIR_FILTER_16, BMP280_STANDBY_0_5]
 ]
 
+_BMP280_REGISTER_CALIB = const(0x88)
 _BMP280_REGISTER_ID = const(0xD0)
 _BMP280_REGISTER_RESET = const(0xE0)
 _BMP280_REGISTER_STATUS = const(0xF3)
@@ -85,27 +88,74 @@ _BMP280_REGISTER_CONFIG = const(0xF5)  # IIR filter config
 _BMP280_REGISTER_DATA = const(0xF7)
 
 
+def _compensate_p32(t_fine, adc_p, cal):
+    # 32-bit integer formulas from datasheet page 46, pressure in Pa. MicroPython
+    # boxes ints beyond 31 bits, the two products that get there are split
+    var1 = (t_fine >> 1) - 64000
+    var2 = (((var1 >> 2) * (var1 >> 2)) >> 11) * cal[8]
+    var2 = var2 + ((var1 * cal[7]) << 1)
+    var2 = (var2 >> 2) + (cal[6] << 16)
+    var1 = (((cal[5] * (((var1 >> 2) * (var1 >> 2)) >> 13)) >> 3) + ((cal[4] * var1) >> 1)) >> 18
+    # ((32768 + var1) * P1) >> 15 with P1 taken a byte at a time, the low byte's
+    # remainder below 256 never changes the result
+    var1 = 32768 + var1
+    var1 = ((var1 * (cal[3] >> 8)) + ((var1 * (cal[3] & 0xFF)) >> 8)) >> 7
+    a = (1048576 - adc_p) - (var2 >> 12)
+    if var1 <= 0 or a <= 0:
+        return 0
+    # (a * 6250) // var1 by long division as in the viper build, the product needs 33 bits
+    k = 6250
+    if a >= 687195: # The datasheet halves first when a * 3125 would not fit in 31 bits
+        k = 3125
+    p = 0
+    r = 0
+    bit = 21
+    while bit >= 0:
+        r = (r << 1) + ((a >> bit) & 1) * k
+        p = p << 1
+        while r >= var1:
+            r = r - var1
+            p = p + 1
+        bit = bit - 1
+    if k == 3125:
+        p = p << 1
+    var1 = (cal[11] * (((p >> 3) * (p >> 3)) >> 13)) >> 12
+    var2 = ((p >> 2) * cal[10]) >> 13
+    return p + ((var1 + var2 + cal[9]) >> 4)
+
+# The viper build keeps every intermediate value in a machine word
+try:
+    from bmp280_viper import compensate_p32
+except (ImportError, SyntaxError, ValueError):
+    compensate_p32 = _compensate_p32
+
+
 class BMP280:
-    def __init__(self, i2c_bus, addr=0x76, use_case=BMP280_CASE_HANDHELD_DYN):
+    def __init__(self, i2c_bus, addr=0x76, use_case=BMP280_CASE_HANDHELD_DYN, calibration=None, int32=False):
         self._bmp_i2c = i2c_bus
         self._i2c_addr = addr
 
-        # read calibration data
-        # < little-endian
-        # H unsigned short
-        # h signed short
-        self._T1 = unp('<H', self._read(0x88, 2))[0]
-        self._T2 = unp('<h', self._read(0x8A, 2))[0]
-        self._T3 = unp('<h', self._read(0x8C, 2))[0]
-        self._P1 = unp('<H', self._read(0x8E, 2))[0]
-        self._P2 = unp('<h', self._read(0x90, 2))[0]
-        self._P3 = unp('<h', self._read(0x92, 2))[0]
-        self._P4 = unp('<h', self._read(0x94, 2))[0]
-        self._P5 = unp('<h', self._read(0x96, 2))[0]
-        self._P6 = unp('<h', self._read(0x98, 2))[0]
-        self._P7 = unp('<h', self._read(0x9A, 2))[0]
-        self._P8 = unp('<h', self._read(0x9C, 2))[0]
-        self._P9 = unp('<h', self._read(0x9E, 2))[0]
+        # int32 selects the datasheet's 32-bit pressure formulas, 1 Pa resolution
+        # and no bigint arithmetic for the calibration of real chips, instead of
+        # the 64-bit ones
+        self.int32 = int32
+        self._cal32 = None
+
+        # buffer for the data registers, reused by every gauge
+        self._data = bytearray(6)
+
+        # calibration words saved from an earlier boot skip the bus read
+        if calibration is None:
+            # read calibration data, 0x88..0x9F in one burst
+            # < little-endian
+            # H unsigned short
+            # h signed short
+            calib = bytearray(24)
+            self._bmp_i2c.readfrom_mem_into(self._i2c_addr, _BMP280_REGISTER_CALIB, calib)
+            calibration = unpack_from('<HhhHhhhhhhhh', calib)
+        (self._T1, self._T2, self._T3,
+         self._P1, self._P2, self._P3, self._P4, self._P5,
+         self._P6, self._P7, self._P8, self._P9) = calibration
 
         # output raw
         self._t_raw = 0
@@ -116,8 +166,8 @@ class BMP280:
         self._p = 0
 
         self.read_wait_ms = 0  # interval between forced measure and readout
-        self._new_read_ms = 200  # interval between
-        self._last_read_ts = 0
+        self._new_read_ms = 200  # interval between reads of the data registers
+        self._last_read_ts = None
 
         if use_case is not None:
             self.use_case(use_case)
@@ -131,9 +181,15 @@ class BMP280:
         return self._bmp_i2c.writeto_mem(self._i2c_addr, addr, b_arr)
 
     def _gauge(self):
-        # TODO limit new reads
+        # values read less than _new_read_ms ago are reused without touching the bus
+        now = ticks_ms()
+        if self._last_read_ts is not None and ticks_diff(now, self._last_read_ts) < self._new_read_ms:
+            return
+        self._last_read_ts = now
+
         # read all data at once (as by spec)
-        d = self._read(_BMP280_REGISTER_DATA, 6)
+        d = self._data
+        self._bmp_i2c.readfrom_mem_into(self._i2c_addr, _BMP280_REGISTER_DATA, d)
 
         self._p_raw = (d[0] << 12) + (d[1] << 4) + (d[2] >> 4)
         self._t_raw = (d[3] << 12) + (d[4] << 4) + (d[5] >> 4)
@@ -146,6 +202,7 @@ class BMP280:
         self._write(_BMP280_REGISTER_RESET, 0xB6)
 
     def load_test_calibration(self):
+        self._cal32 = None
         self._T1 = 27504
         self._T2 = 26435
         self._T3 = -1000
@@ -163,6 +220,10 @@ class BMP280:
         self._t_raw = 519888
         self._p_raw = 415148
 
+    def calibration(self):
+        return [self._T1, self._T2, self._T3, self._P1, self._P2, self._P3,
+                self._P4, self._P5, self._P6, self._P7, self._P8, self._P9]
+
     def print_calibration(self):
         print("T1: {} {}".format(self._T1, type(self._T1)))
         print("T2: {} {}".format(self._T2, type(self._T2)))
@@ -178,8 +239,11 @@ class BMP280:
         print("P9: {} {}".format(self._P9, type(self._P9)))
 
     def _calc_t_fine(self):
-        # From datasheet page 22
         self._gauge()
+        self._compensate_t_fine()
+
+    def _compensate_t_fine(self):
+        # From datasheet page 22
         if self._t_fine == 0:
             var1 = (((self._t_raw >> 3) - (self._T1 << 1)) * self._T2) >> 11
             var2 = (((((self._t_raw >> 4) - self._T1)
@@ -191,14 +255,52 @@ class BMP280:
     @property
     def temperature(self):
         self._calc_t_fine()
+        return self._compensate_t()
+
+    @property
+    def pressure(self):
+        self._calc_t_fine()
+        return self._compensate_p()
+
+    def read(self):
+        """Returns (temperature, pressure) from a single read of the data registers"""
+        self._calc_t_fine()
+        return self._compensate_t(), self._compensate_p()
+
+    def measure(self, timeout_ms=100):
+        """Runs one forced mode conversion and returns (temperature, pressure)
+
+        The chip returns to sleep mode by itself after the conversion, which
+        suits sampling at low rates.
+        """
+        self.force_measure()
+        sleep_ms(self.read_wait_ms)
+        return self.finish(timeout_ms)
+
+    def finish(self, timeout_ms=100):
+        """Waits for a conversion started with force_measure() and returns (temperature, pressure)
+
+        Conversions on several chips can run at the same time, started one
+        after the other and finished after a single wait of read_wait_ms.
+        """
+        start = ticks_ms()
+        while self.is_measuring and ticks_diff(ticks_ms(), start) < timeout_ms:
+            sleep_ms(1)
+        self._last_read_ts = None
+        return self.read()
+
+    def _compensate_t(self):
         if self._t == 0:
             self._t = ((self._t_fine * 5 + 128) >> 8) / 100.
         return self._t
 
-    @property
-    def pressure(self):
+    def _compensate_p(self):
+        if self._p == 0 and self.int32:
+            if self._cal32 is None:
+                self._cal32 = array('i', self.calibration())
+            self._p = compensate_p32(self._t_fine, self._p_raw, self._cal32)
+            return self._p # 0 for a var1 of 0, the 64-bit path would give the same
         # From datasheet page 22
-        self._calc_t_fine()
         if self._p == 0:
             var1 = self._t_fine - 128000
             var2 = var1 * var1 * self._P6
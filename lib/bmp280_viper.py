@@ -0,0 +1,54 @@
+#
+# Fetch The Weather: Weather stations
+# BMP280 32-bit pressure compensation, viper build
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Same results as _compensate_p32() in bmp280.py, compiled to machine code
+# with native 32-bit ints so no intermediate value is boxed and the P1
+# product needs no split. Ports without
+# the viper emitter fail to compile this module, bmp280.py then uses its
+# pure Python copy. On a host the decorator from sim/modules does nothing.
+
+import micropython
+
+try:
+    ptr32
+except NameError:
+    ptr32 = None # Only the viper compiler knows this type
+
+@micropython.viper
+def compensate_p32(t_fine: int, adc_p: int, cal: ptr32) -> int:
+    # cal holds T1, T2, T3, P1 .. P9 as array('i')
+    var1 = (t_fine >> 1) - 64000
+    var2 = (((var1 >> 2) * (var1 >> 2)) >> 11) * cal[8]
+    var2 = var2 + ((var1 * cal[7]) << 1)
+    var2 = (var2 >> 2) + (cal[6] << 16)
+    var1 = (((cal[5] * (((var1 >> 2) * (var1 >> 2)) >> 13)) >> 3) + ((cal[4] * var1) >> 1)) >> 18
+    var1 = ((32768 + var1) * cal[3]) >> 15
+    a = (1048576 - adc_p) - (var2 >> 12)
+    if var1 <= 0 or a <= 0:
+        return 0
+    # (a * 3125 * 2) // var1 by long division, the product needs 33 bits
+    k = 6250
+    if a >= 687195: # a * 3125 does not fit in 31 bits, halve first like the datasheet
+        k = 3125
+    q = 0
+    r = 0
+    bit = 21
+    while bit >= 0:
+        r = (r << 1) + ((a >> bit) & 1) * k
+        q = q << 1
+        while r >= var1:
+            r = r - var1
+            q = q + 1
+        bit = bit - 1
+    if k == 3125:
+        q = q << 1
+    var1 = (cal[11] * (((q >> 3) * (q >> 3)) >> 13)) >> 12
+    var2 = ((q >> 2) * cal[10]) >> 13
+    return q + ((var1 + var2 + cal[9]) >> 4)
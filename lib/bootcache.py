@@ -0,0 +1,57 @@
+#
+# Fetch The Weather: Weather stations
+# Warm-start hardware probe cache
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+import json, os
+
+class BootCache:
+    """Keeps the results of a full hardware probe across boots
+
+    The cache holds which sensors were found, the BMP280 I2C address and
+    calibration words and the Wi-Fi channel and BSSID of the last
+    connection. A station booting with a valid cache can skip probing, and
+    invalidates the cache when a cached device fails so the next boot runs
+    a full probe again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.data = None
+
+    def load(self):
+        try:
+            f = open(self.path)
+            data = json.load(f)
+            f.close()
+        except (OSError, ValueError):
+            return None
+        if "sensors" not in data:
+            return None
+        self.data = data
+        return data
+
+    def save(self, data):
+        self.data = data
+        f = open(self.path, "w")
+        json.dump(data, f)
+        f.close()
+
+    def update(self, key, value):
+        """Changes one entry of a loaded cache, writing the file only if it changed"""
+        if self.data == None or self.data.get(key) == value:
+            return
+        self.data[key] = value
+        self.save(self.data)
+
+    def invalidate(self):
+        self.data = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
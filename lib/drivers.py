@@ -0,0 +1,309 @@
+#
+# Fetch The Weather: Weather stations
+# Sensor driver registry and scheduler
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+import machine
+
+from ticks import ticks_ms, ticks_diff, sleep_ms
+import i2cbus
+
+# Driver name: driver class
+REGISTRY = {}
+
+def register(cls):
+    """Class decorator adding a driver to the registry under its name"""
+    REGISTRY[cls.name] = cls
+    return cls
+
+class Driver:
+    """Base class of sensor drivers
+
+    A driver is created with its entry from the "sensors" list in
+    config.json. probe() sets the sensor up, read() returns a dict of the
+    values it measured and sleep() puts the sensor in its lowest power state
+    between reads. Drivers named in requires must have been set up first,
+    their latest values are passed to read(). The scheduler copies the
+    values, so read() can fill in and return the same dict every time.
+    """
+
+    name = None
+    requires = ()
+    min_interval = 0 # Shortest useful time between reads in seconds
+
+    def __init__(self, options):
+        self.options = options
+        self.interval = max(options.get("interval", 60), self.min_interval)
+        self.last = None # ticks_ms of the last read
+        self.last_read = None # ticks_ms of the last successful read
+        self.failures = 0
+        self.reads = 0 # Successful reads
+        self.sensor = None
+        self.result = {} # Reused by read(), saves a dict per read
+
+    def probe(self, cached):
+        """Sets the sensor up and returns the data to cache for the next warm start
+
+        cached is what probe() returned during the last full probe, or None
+        when there is no cache. Returns False or raises when the sensor is missing.
+        """
+        return True
+
+    def read(self, values):
+        return {}
+
+    def sleep(self):
+        pass
+
+@register
+class DHT11Driver(Driver):
+    name = "dht11"
+    min_interval = 1
+
+    def probe(self, cached):
+        import dht
+        self.sensor = dht.DHT11(machine.Pin(self.options.get("pin", 4)))
+        if cached == None:
+            try: self.sensor.measure() # First time always fails to pull data due to a checksum error
+            except: self.sensor.measure() # Second time should work if the sensor is available
+        return True
+
+    def read(self, values):
+        try:
+            self.sensor.measure()
+        except OSError:
+            self.sensor.measure() # The first reading after power up fails with a checksum error
+        self.result["temp"] = self.sensor.temperature()
+        self.result["humidity"] = self.sensor.humidity()
+        return self.result
+
+@register
+class MQ135Driver(Driver):
+    name = "mq135"
+    requires = ("dht11",)
+
+    def probe(self, cached):
+        from mq135 import MQ135
+        self.sensor = MQ135(machine.Pin(self.options.get("pin", 26)), samples=self.options.get("samples", 1),
+                            sample_us=self.options.get("sample_us", 0), trim=self.options.get("trim", 0))
+        if cached == None:
+            self.sensor.get_rzero() # 'Read from module' check
+        self.table = self.options.get("table", False)
+        if self.table:
+            self.sensor.load_table(self.options.get("table_file"))
+        return True
+
+    def read(self, values):
+        temp = values.get("temp")
+        humidity = values.get("humidity")
+        if temp == None or humidity == None:
+            raise OSError("no DHT11 reading to correct the MQ135 reading with")
+        if self.table:
+            self.result["quality"] = self.sensor.table_ppm(temp, humidity)
+        else:
+            self.result["quality"] = self.sensor.snapshot(temp, humidity)[5] # Corrected ppm
+        return self.result
+
+@register
+class BMP280Driver(Driver):
+    """One or more BMP280s on a shared I2C bus
+
+    "addr" is an address or a list of addresses of redundant chips. Their
+    conversions run at the same time and the pressures of the chips that
+    answered are combined: chips further than "tolerance" Pa from the
+    median are voted out and the rest averaged. Two chips that disagree
+    cannot outvote each other, the one closer to the last value is used.
+    A chip that fails is skipped until the bus retries it. "compensation"
+    "int32" selects the 32-bit integer pressure formulas.
+    """
+
+    name = "bmp280"
+
+    def probe(self, cached):
+        from bmp280 import BMP280, BMP280_CASE_WEATHER, BMP280_OS_HIGH
+        self.bus = i2cbus.get(self.options.get("sda", 8), self.options.get("scl", 9))
+        self.tolerance = self.options.get("tolerance", 200)
+        self.last_pressure = None
+        int32 = self.options.get("compensation", "int64") == "int32"
+        addrs = self.options.get("addr", 0x76)
+        if type(addrs) is int:
+            addrs = [addrs]
+        calibrations = {}
+        if type(cached) is dict:
+            if "addr" in cached: # Single chip cache of older versions
+                calibrations[cached["addr"]] = cached["calibration"]
+            for addr, calibration in cached.get("devices", []):
+                calibrations[addr] = calibration
+        self.sensors = []
+        for addr in addrs:
+            sensor = None
+            if addr in calibrations:
+                # The cached calibration skips the bus scan and calibration read
+                try:
+                    sensor = BMP280(self.bus, addr=addr, use_case=BMP280_CASE_WEATHER, calibration=calibrations[addr], int32=int32)
+                except OSError:
+                    print("WARNING: Cached BMP280 module at " + hex(addr) + " did not respond, probing I2C bus...")
+            if sensor == None:
+                if addr not in self.bus.scan():
+                    print("ERROR: BMP280 module not found at I2C address " + hex(addr))
+                    continue
+                print("INFO: bmp280 module found at I2C address " + hex(addr))
+                sensor = BMP280(self.bus, addr=addr, use_case=BMP280_CASE_WEATHER, int32=int32)
+            sensor.oversample(BMP280_OS_HIGH)
+            sensor.sleep() # Conversions are triggered by each reading
+            self.sensors.append(sensor)
+        if len(self.sensors) == 0:
+            return False
+        self.sensor = self.sensors[0]
+        return {"devices": [[sensor._i2c_addr, sensor.calibration()] for sensor in self.sensors]}
+
+    def read(self, values):
+        started = []
+        wait_ms = 0
+        for sensor in self.sensors:
+            if self.bus.available(sensor._i2c_addr) == False:
+                continue
+            try:
+                sensor.force_measure()
+            except OSError:
+                self.bus.fail(sensor._i2c_addr)
+                continue
+            started.append(sensor)
+            wait_ms = max(wait_ms, sensor.read_wait_ms)
+        sleep_ms(wait_ms) # One wait for all conversions
+        pressures = []
+        for sensor in started:
+            try:
+                pressures.append(sensor.finish()[1])
+            except OSError:
+                self.bus.fail(sensor._i2c_addr)
+                continue
+            self.bus.ok(sensor._i2c_addr)
+        self.bus.end_cycle()
+        if len(pressures) == 0:
+            raise OSError(19) # ENODEV
+        # Forced mode conversions leave the chips asleep, no sleep() needed
+        self.last_pressure = self.combine(pressures)
+        self.result["pressure"] = self.last_pressure
+        return self.result
+
+    def combine(self, pressures):
+        if len(pressures) == 1:
+            return pressures[0]
+        pressures.sort()
+        n = len(pressures)
+        if n == 2 and pressures[1] - pressures[0] > self.tolerance and self.last_pressure != None:
+            if abs(pressures[0] - self.last_pressure) <= abs(pressures[1] - self.last_pressure):
+                return pressures[0]
+            return pressures[1]
+        median = (pressures[(n - 1) // 2] + pressures[n // 2]) / 2
+        total = 0
+        count = 0
+        for p in pressures:
+            if abs(p - median) <= self.tolerance:
+                total = total + p
+                count = count + 1
+        if count == 0: # Two chips apart and nothing to compare with
+            return median
+        return total / count
+
+def load(sensors, cache=None):
+    """Creates and probes the drivers listed in the configuration
+
+    cache maps driver names to the results of the last full probe, a driver
+    cached as False is not probed again. Returns the drivers that were set
+    up and the probe results to cache.
+    """
+    drivers = []
+    results = {}
+    for options in sensors:
+        name = options["driver"]
+        if options.get("enabled", True) == False:
+            print("INFO: " + name.upper() + " module is disabled")
+            continue
+        if "module" in options:
+            __import__(options["module"]) # Registers drivers that are not built in
+        if name not in REGISTRY:
+            print("ERROR: Unknown sensor driver " + name)
+            continue
+        cached = None
+        if cache != None:
+            cached = cache.get(name)
+            if cached == False:
+                print("ERROR: " + name.upper() + " module not found during the last probe")
+                results[name] = False
+                continue
+        driver = REGISTRY[name](options)
+        try:
+            result = driver.probe(cached)
+        except:
+            result = False
+        missing = [r for r in driver.requires if results.get(r, False) == False]
+        if result == False:
+            print("ERROR: Failed to initialize " + name.upper() + " module")
+        elif len(missing) > 0:
+            print("ERROR: Dependancy check failed for module " + name.upper() + ": " + missing[0].upper() + " module is not initialized")
+            result = False
+        else:
+            print("INFO: Initialized " + name.upper() + " module")
+            drivers.append(driver)
+        results[name] = result
+    return drivers, results
+
+class Scheduler:
+    """Reads every driver at its own interval and keeps the latest values
+
+    poll() reads the drivers that are due, in configuration order, puts
+    each back to sleep after its read and returns the merged latest values.
+    on_read is called with the values of every successful read. A failed
+    read calls on_failure with the driver name and keeps the previous values
+    until the driver has not read successfully for stale_after of its
+    intervals, then its values are dropped so they are not reported as new.
+    """
+
+    def __init__(self, drivers, on_failure=None, on_read=None, stale_after=3):
+        self.drivers = drivers
+        self.on_failure = on_failure
+        self.on_read = on_read
+        self.stale_after = stale_after
+        self.values = {}
+
+    def get(self, name):
+        for driver in self.drivers:
+            if driver.name == name:
+                return driver
+        return None
+
+    def poll(self, now=None):
+        if now == None:
+            now = ticks_ms()
+        for driver in self.drivers:
+            if driver.last != None and ticks_diff(now, driver.last) < driver.interval * 1000:
+                continue
+            driver.last = now
+            try:
+                try:
+                    values = driver.read(self.values)
+                finally:
+                    driver.sleep()
+            except OSError:
+                driver.failures = driver.failures + 1
+                print("ERROR: Failed to read " + driver.name.upper() + " module")
+                if self.on_failure != None:
+                    self.on_failure(driver.name)
+                if driver.last_read != None and ticks_diff(now, driver.last_read) >= self.stale_after * driver.interval * 1000:
+                    for name in driver.result:
+                        if name in self.values:
+                            del self.values[name]
+                continue
+            driver.reads = driver.reads + 1
+            driver.last_read = now
+            self.values.update(values)
+            if self.on_read != None:
+                self.on_read(values)
+        return self.values
@@ -0,0 +1,99 @@
+#
+# Fetch The Weather: Weather stations
+# Shared I2C bus manager
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+import machine
+
+from ticks import ticks_ms, ticks_us, ticks_diff, ticks_add
+
+# (sda, scl): Bus, so drivers on the same pins share one bus
+BUSES = {}
+
+def get(sda, scl):
+    """Returns the shared bus on the given pins, creating it on first use"""
+    key = (sda, scl)
+    if key not in BUSES:
+        BUSES[key] = Bus(machine.I2C(sda=machine.Pin(sda), scl=machine.Pin(scl)))
+    return BUSES[key]
+
+class Bus:
+    """Wraps a machine.I2C shared by several drivers
+
+    Drivers pass the Bus where they would pass the I2C object. The bus is
+    scanned at most once, every transaction is timed, and end_cycle()
+    reports the bus time since the last cycle to on_cycle. A device marked
+    failed is skipped by available() until its retry time, the wait doubles
+    with every failure from retry_min_ms up to retry_max_ms.
+    """
+
+    def __init__(self, i2c, retry_min_ms=60000, retry_max_ms=3600000):
+        self.i2c = i2c
+        self.retry_min_ms = retry_min_ms
+        self.retry_max_ms = retry_max_ms
+        self.devices = None # Addresses found by the scan
+        self.failed = {} # Address: [failures in a row, ticks_ms of the next retry]
+        self.busy_us = 0 # Bus time of the current cycle
+        self.transactions = 0
+        self.last_cycle_us = 0
+        self.on_cycle = None
+
+    def _timed(self, start):
+        self.busy_us = self.busy_us + ticks_diff(ticks_us(), start)
+        self.transactions = self.transactions + 1
+
+    def scan(self):
+        if self.devices == None:
+            start = ticks_us()
+            self.devices = self.i2c.scan()
+            self._timed(start)
+        return self.devices
+
+    def readfrom_mem(self, addr, reg, n):
+        start = ticks_us()
+        try:
+            return self.i2c.readfrom_mem(addr, reg, n)
+        finally:
+            self._timed(start)
+
+    def readfrom_mem_into(self, addr, reg, buf):
+        start = ticks_us()
+        try:
+            self.i2c.readfrom_mem_into(addr, reg, buf)
+        finally:
+            self._timed(start)
+
+    def writeto_mem(self, addr, reg, buf):
+        start = ticks_us()
+        try:
+            self.i2c.writeto_mem(addr, reg, buf)
+        finally:
+            self._timed(start)
+
+    def fail(self, addr):
+        failures = self.failed.get(addr, [0, 0])[0] + 1
+        wait = min(self.retry_max_ms, self.retry_min_ms << min(failures - 1, 16))
+        self.failed[addr] = [failures, ticks_add(ticks_ms(), wait)]
+        print("WARNING: I2C device " + hex(addr) + " failed, retrying in " + str(wait // 1000) + " s")
+
+    def ok(self, addr):
+        if addr in self.failed:
+            del self.failed[addr]
+
+    def available(self, addr):
+        """Returns False while a failed device waits for its retry"""
+        state = self.failed.get(addr)
+        return state == None or ticks_diff(ticks_ms(), state[1]) >= 0
+
+    def end_cycle(self):
+        """Returns the bus time in us since the last cycle and starts a new one"""
+        self.last_cycle_us = self.busy_us
+        self.busy_us = 0
+        if self.on_cycle != None:
+            self.on_cycle(self.last_cycle_us)
+        return self.last_cycle_us
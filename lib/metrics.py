@@ -0,0 +1,136 @@
+#
+# Fetch The Weather: Weather stations
+# Cycle timing and heap instrumentation
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+import gc
+from array import array
+
+from ticks import ticks_us, ticks_ms, ticks_diff
+
+def _heap():
+    # Returns free and used heap bytes, CPython has no fixed heap
+    if hasattr(gc, "mem_free"):
+        return gc.mem_free(), gc.mem_alloc()
+    return 0, 0
+
+class Metrics:
+    """Collects per-stage latency, heap use, GC runs and HTTP status counts
+
+    instrument() replaces a method of an object with a timed wrapper, so
+    nothing is measured, and nothing costs time, unless metrics are enabled
+    and the method was instrumented. Stage statistics (count, min, max,
+    total in us) accumulate until summary() reports and resets them. The
+    heap is sampled once per cycle into a fixed-size ring. MicroPython does
+    not count collections, a drop of the used heap between two samples is
+    counted as one GC run.
+    """
+
+    def __init__(self, size=16):
+        self.stages = {} # name: [count, min, max, total]
+        self.statuses = {}
+        self.size = size
+        self.cycles = 0
+        self.ring_ms = array('l', [0] * size) # Cycle end, ticks_ms
+        self.ring_free = array('l', [0] * size)
+        self.ring_used = array('l', [0] * size)
+        self.gc_runs = 0
+        self.last_used = _heap()[1]
+        self.watched = {} # name: function returning a value for every health record
+
+    def add(self, name, us):
+        stage = self.stages.get(name)
+        if stage == None:
+            self.stages[name] = [1, us, us, us]
+            return
+        stage[0] = stage[0] + 1
+        if us < stage[1]:
+            stage[1] = us
+        if us > stage[2]:
+            stage[2] = us
+        stage[3] = stage[3] + us
+
+    def status(self, code):
+        code = str(code) # JSON object keys
+        self.statuses[code] = self.statuses.get(code, 0) + 1
+
+    def timed(self, name, fn):
+        """Returns fn wrapped to record its latency under name"""
+        def wrapper(*args, **kwargs):
+            start = ticks_us()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(name, ticks_diff(ticks_us(), start))
+        return wrapper
+
+    def instrument(self, obj, method, name=None):
+        setattr(obj, method, self.timed(name or method, getattr(obj, method)))
+
+    def instrument_status(self, obj, method, name=None):
+        """Like instrument() for methods returning (status, text), also counts the status"""
+        fn = self.timed(name or method, getattr(obj, method))
+        def wrapper(*args, **kwargs):
+            result = fn(*args, **kwargs)
+            self.status(result[0])
+            return result
+        setattr(obj, method, wrapper)
+
+    def watch(self, name, fn):
+        """Adds the value of fn() to every health record under name"""
+        self.watched[name] = fn
+
+    def end_cycle(self):
+        """Samples the heap at the end of a cycle"""
+        free, used = _heap()
+        if used < self.last_used:
+            self.gc_runs = self.gc_runs + 1
+        self.last_used = used
+        i = self.cycles % self.size
+        self.ring_ms[i] = ticks_ms()
+        self.ring_free[i] = free
+        self.ring_used[i] = used
+        self.cycles = self.cycles + 1
+
+    def summary(self):
+        """Returns a compact health record and starts a new reporting period
+
+        stages maps each stage to [count, mean, min, max] in us. heap holds
+        the last free and used bytes and the lowest free value in the ring.
+        Every watched value is added under its name.
+        """
+        stages = {}
+        for name in self.stages:
+            count, low, high, total = self.stages[name]
+            stages[name] = [count, total // count, low, high]
+        n = min(self.cycles, self.size)
+        free = used = low_free = 0
+        if n > 0:
+            i = (self.cycles - 1) % self.size
+            free = self.ring_free[i]
+            used = self.ring_used[i]
+            low_free = min(self.ring_free[:n])
+        health = {"cycles": self.cycles, "stages": stages, "heap": [free, used, low_free],
+                  "gc": self.gc_runs, "http": self.statuses}
+        for name in self.watched:
+            health[name] = self.watched[name]()
+        self.stages = {}
+        self.statuses = {}
+        self.gc_runs = 0
+        return health
+
+    def attach(self, data, every):
+        """Makes data.get_dict() end a cycle and add a health record every few cycles"""
+        get_dict = data.get_dict
+        def wrapper():
+            record = get_dict()
+            self.end_cycle()
+            if self.cycles % every == 0:
+                record["health"] = self.summary()
+            return record
+        data.get_dict = wrapper
@@ -10,7 +10,20 @@ More info:
 
 import math
 import time
+from array import array
 from machine import ADC
+from ticks import sleep_us
+
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+# Table file: magic, RLOAD, RZERO, PARA, PARB, then the ppm table and the grid as float32
+TABLE_MAGIC = b"MQTB"
+TABLE_HEADER = "<4sffff"
+TABLE_HEADER_SIZE = 20
+TABLE_CODES = 1025 # Rounding of read_u16() can give 1024
 
 class MQ135(object):
     """ Class for dealing with MQ13 Gas Sensors """
@@ -34,9 +47,172 @@ class MQ135(object):
     # Atmospheric CO2 level for calibration purposes
     ATMOCO2 = 397.13
 
+    # Factor between the sensor resistance and RZero, constant for the class
+    RZERO_FACTOR = math.pow((ATMOCO2/PARA), (1./PARB))
+
+    # Grid of the temperature and humidity correction for table lookups. The
+    # correction model changes at 20 C, the grid has a row for each side of
+    # that step so no cell interpolates across it.
+    GRID_T0 = -20.0
+    GRID_T_STEP = 2.5
+    GRID_T_SPLIT = 20.0
+    GRID_NT_LOW = 17 # -20 to 20 C, the last row is the limit from below
+    GRID_NT = 30 # And 20 to 50 C
+    GRID_H0 = 0.0
+    GRID_H_STEP = 10.0
+    GRID_NH = 11 # 0 to 100 %
+
 
-    def __init__(self, pin):
+    def __init__(self, pin, samples=1, sample_us=0, trim=0):
+        """samples ADC readings are taken sample_us apart for every value. They are
+        sorted and the trim lowest and highest are dropped before averaging, a trim
+        of (samples - 1) // 2 gives the median."""
         self.pin = pin
+        self.adc = None
+        self.samples = max(1, samples)
+        self.sample_us = sample_us
+        self.trim = min(trim, (self.samples - 1) // 2)
+        self.buf = array('H', bytes(2 * self.samples))
+        self.table = None # ppm by 10 bit ADC code, see load_table()
+        self.grid = None
+
+    def get_adc(self):
+        """Returns the ADC of the pin, created on first use"""
+        if self.adc is None:
+            self.adc = ADC(self.pin)
+        return self.adc
+
+    def read_raw(self):
+        """Returns one 10 bit ADC reading, filtered over a burst of samples if configured"""
+        if self.samples == 1:
+            return (self.get_adc().read_u16() + 32) >> 6 # Rounded like read_u16()/64
+        return self.read_burst()
+
+    def read_burst(self):
+        """Takes a burst of samples and returns their trimmed mean as a 10 bit value"""
+        read = self.get_adc().read_u16
+        buf = self.buf
+        n = self.samples
+        for i in range(n):
+            buf[i] = read()
+            if self.sample_us:
+                sleep_us(self.sample_us)
+        # Insertion sort in place, the buffer is small
+        for i in range(1, n):
+            v = buf[i]
+            j = i - 1
+            while j >= 0 and buf[j] > v:
+                buf[j + 1] = buf[j]
+                j = j - 1
+            buf[j + 1] = v
+        total = 0
+        for i in range(self.trim, n - self.trim):
+            total = total + buf[i]
+        return (total // (n - 2 * self.trim) + 32) >> 6
+
+    def resistance_from_raw(self, value):
+        """Returns the resistance in kOhms for a 10 bit ADC reading // -1 for 0"""
+        if value == 0:
+            return -1
+        return (1023./value - 1.) * self.RLOAD
+
+    def snapshot(self, temperature, humidity):
+        """Returns all derived values from a single ADC reading
+
+        Returns a tuple (resistance, corrected_resistance, rzero, corrected_rzero,
+        ppm, corrected_ppm). All values are -1 if the reading is at either end
+        of the ADC range.
+        """
+        resistance = self.resistance_from_raw(self.read_raw())
+        if resistance <= 0:
+            return (-1, -1, -1, -1, -1, -1)
+        corrected_resistance = resistance / self.get_correction_factor(temperature, humidity)
+        ppm = self.PARA * math.pow((resistance / self.RZERO), -self.PARB)
+        corrected_ppm = self.PARA * math.pow((corrected_resistance / self.RZERO), -self.PARB)
+        return (resistance, corrected_resistance, resistance * self.RZERO_FACTOR,
+                corrected_resistance * self.RZERO_FACTOR, ppm, corrected_ppm)
+
+    def build_table(self):
+        """Computes the ppm of every ADC code and the correction grid
+
+        Corrected ppm is PARA * (resistance / (factor * RZERO)) ^ -PARB, which
+        is the uncorrected ppm of the ADC code times factor ^ PARB. The first
+        is tabled for all codes, the second on a grid over temperature
+        and humidity that table_ppm() interpolates. Both are float32.
+        """
+        table = array('f', bytes(4 * TABLE_CODES))
+        for code in range(TABLE_CODES):
+            resistance = self.resistance_from_raw(code)
+            table[code] = self.PARA * math.pow(resistance / self.RZERO, -self.PARB) if resistance > 0 else -1
+        grid = array('f', bytes(4 * self.GRID_NT * self.GRID_NH))
+        for i in range(self.GRID_NT):
+            if i < self.GRID_NT_LOW:
+                temperature = min(self.GRID_T0 + i * self.GRID_T_STEP, self.GRID_T_SPLIT - 1e-6)
+            else:
+                temperature = self.GRID_T_SPLIT + (i - self.GRID_NT_LOW) * self.GRID_T_STEP
+            for j in range(self.GRID_NH):
+                factor = self.get_correction_factor(temperature, self.GRID_H0 + j * self.GRID_H_STEP)
+                grid[i * self.GRID_NH + j] = math.pow(factor, self.PARB)
+        self.table = table
+        self.grid = grid
+
+    def _table_header(self):
+        return struct.pack(TABLE_HEADER, TABLE_MAGIC, self.RLOAD, self.RZERO, self.PARA, self.PARB)
+
+    def load_table(self, path=None):
+        """Loads the tables from path, or builds them and saves them to path
+
+        A file written with other sensor constants is rebuilt.
+        """
+        if path is not None:
+            try:
+                f = open(path, "rb")
+                try:
+                    if f.read(TABLE_HEADER_SIZE) == self._table_header():
+                        table = array('f', bytes(4 * TABLE_CODES))
+                        grid = array('f', bytes(4 * self.GRID_NT * self.GRID_NH))
+                        if f.readinto(table) == 4 * TABLE_CODES and f.readinto(grid) == 4 * len(grid):
+                            self.table = table
+                            self.grid = grid
+                            return
+                finally:
+                    f.close()
+            except OSError:
+                pass
+        self.build_table()
+        if path is not None:
+            f = open(path, "wb")
+            f.write(self._table_header())
+            f.write(self.table)
+            f.write(self.grid)
+            f.close()
+
+    def table_correction(self, temperature, humidity):
+        """Returns factor ^ PARB bilinearly interpolated from the grid, clamped at its edges"""
+        if temperature < self.GRID_T_SPLIT:
+            x = min(max((temperature - self.GRID_T0) / self.GRID_T_STEP, 0.0), self.GRID_NT_LOW - 1.0)
+            i = min(int(x), self.GRID_NT_LOW - 2)
+        else:
+            x = min((temperature - self.GRID_T_SPLIT) / self.GRID_T_STEP, self.GRID_NT - self.GRID_NT_LOW - 1.0)
+            i = min(int(x), self.GRID_NT - self.GRID_NT_LOW - 2)
+            x = x + self.GRID_NT_LOW
+            i = i + self.GRID_NT_LOW
+        y = min(max((humidity - self.GRID_H0) / self.GRID_H_STEP, 0.0), self.GRID_NH - 1.0)
+        j = min(int(y), self.GRID_NH - 2)
+        fx = x - i
+        fy = y - j
+        g = self.grid
+        k = i * self.GRID_NH + j
+        low = g[k] + (g[k + 1] - g[k]) * fy
+        high = g[k + self.GRID_NH] + (g[k + self.GRID_NH + 1] - g[k + self.GRID_NH]) * fy
+        return low + (high - low) * fx
+
+    def table_ppm(self, temperature, humidity):
+        """Returns the corrected ppm from the tables, -1 at either end of the ADC range"""
+        ppm = self.table[self.read_raw()]
+        if ppm < 0:
+            return -1
+        return ppm * self.table_correction(temperature, humidity)
 
     def get_correction_factor(self, temperature, humidity):
         """Calculates the correction factor for ambient air temperature and relative humidity
@@ -53,12 +229,7 @@ class MQ135(object):
 
     def get_resistance(self):
         """Returns the resistance of the sensor in kOhms // -1 if not value got in pin"""
-        adc = ADC(self.pin)
-        value = round(((((((adc.read_u16()/2)/2)/2)/2)/2)/2)) # Patch to convert from read() to read_u16()
-        if value == 0:
-            return -1
-
-        return (1023./value - 1.) * self.RLOAD
+        return self.resistance_from_raw(self.read_raw())
 
     def get_corrected_resistance(self, temperature, humidity):
         """Gets the resistance of the sensor corrected for temperature/humidity"""
@@ -75,12 +246,12 @@ class MQ135(object):
 
     def get_rzero(self):
         """Returns the resistance RZero of the sensor (in kOhms) for calibratioin purposes"""
-        return self.get_resistance() * math.pow((self.ATMOCO2/self.PARA), (1./self.PARB))
+        return self.get_resistance() * self.RZERO_FACTOR
 
     def get_corrected_rzero(self, temperature, humidity):
         """Returns the resistance RZero of the sensor (in kOhms) for calibration purposes
         corrected for temperature/humidity"""
-        return self.get_corrected_resistance(temperature, humidity) * math.pow((self.ATMOCO2/self.PARA), (1./self.PARB))
+        return self.get_corrected_resistance(temperature, humidity) * self.RZERO_FACTOR
 
 
 def mq135lib_example():
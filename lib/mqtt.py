@@ -0,0 +1,365 @@
+#
+# Fetch The Weather: Weather stations
+# MQTT uploads with QoS 1
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+try:
+    import usocket as socket
+except ImportError:
+    import socket
+
+try:
+    import ussl as ssl
+except ImportError:
+    import ssl
+
+import json
+
+from ticks import ticks_ms, ticks_diff
+from uploader import Uploader
+import wire
+
+CONNECT = 0x10
+CONNACK = 0x20
+PUBLISH = 0x30
+PUBACK = 0x40
+PINGREQ = 0xC0
+PINGRESP = 0xD0
+DISCONNECT = 0xE0
+
+QOS1 = 0x02
+DUP = 0x08
+
+# Topic suffix per upload format, MQTT 3.1.1 has no content type
+TOPICS = {"json": "/data", "binary": "/data/wire", "binary+deflate": "/data/wire+deflate"}
+
+def _length(n):
+    # Remaining length as the MQTT variable length integer
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n = n >> 7
+        if n > 0:
+            b = b | 0x80
+        out.append(b)
+        if n == 0:
+            return out
+
+def _string(s):
+    b = s.encode() if type(s) is str else s
+    return bytes((len(b) >> 8, len(b) & 0xFF)) + b
+
+class MQTTClient:
+    """Minimal MQTT 3.1.1 client publishing with QoS 1
+
+    The client connects with clean session off, so the broker keeps the
+    session across reconnects. Every publish stays in inflight until the
+    broker acknowledges it with a PUBACK, at most max_inflight publishes are
+    unacknowledged at a time. When the connection fails inflight is kept,
+    and connect() sends it again with the DUP flag before anything new.
+    ping() keeps an idle connection alive within the keepalive period.
+    """
+
+    def __init__(self, url, client_id, keepalive=60, timeout=10, user=None, password=None, max_inflight=8, buffer_size=256):
+        scheme, _, host = url.split("/", 3)[:3]
+        self.tls = scheme == "mqtts:"
+        if ":" in host:
+            host, port = host.split(":", 1)
+            self.port = int(port)
+        elif self.tls:
+            self.port = 8883
+        else:
+            self.port = 1883
+        self.host = host
+        self.client_id = client_id
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.user = user
+        self.password = password
+        self.max_inflight = max(1, max_inflight)
+        self.sock = None
+        self.rfile = None
+        self.session_present = False
+        self.inflight = [] # [packet ID, topic, payload] waiting for a PUBACK, oldest first
+        self.next_id = 1
+        self.last_send = ticks_ms()
+        # Small publishes go out in one write from this buffer
+        self.buf = bytearray(buffer_size)
+        self.mv = memoryview(self.buf)
+        # Statistics
+        self.connections = 0
+        self.published = 0
+        self.acked = 0
+        self.resent = 0
+
+    def connect(self):
+        addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+        sock = socket.socket()
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(addr)
+            if hasattr(socket, "TCP_NODELAY"):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.tls:
+                if hasattr(ssl, "create_default_context"): # CPython
+                    sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.host)
+                else:
+                    sock = ssl.wrap_socket(sock, server_hostname=self.host)
+        except:
+            sock.close()
+            raise
+        self.sock = sock
+        if hasattr(sock, "makefile"):
+            self.rfile = sock.makefile("rb")
+        else:
+            self.rfile = sock
+        try:
+            flags = 0 # Clean session off
+            payload = _string(self.client_id)
+            if self.user != None:
+                flags = flags | 0x80
+                payload = payload + _string(self.user)
+                if self.password != None:
+                    flags = flags | 0x40
+                    payload = payload + _string(self.password)
+            body = _string("MQTT") + bytes((4, flags, self.keepalive >> 8, self.keepalive & 0xFF)) + payload
+            self._send(bytes((CONNECT,)) + _length(len(body)) + body)
+            kind, body = self._read_packet()
+            if kind != CONNACK or len(body) < 2:
+                raise OSError("no CONNACK from broker")
+            if body[1] != 0:
+                raise OSError("broker refused connection, code " + str(body[1]))
+            self.session_present = body[0] & 1 == 1
+            self.connections = self.connections + 1
+            for message in self.inflight: # Unacknowledged publishes of the last connection
+                self._publish(message[0], message[1], message[2], DUP)
+                self.resent = self.resent + 1
+        except:
+            self.close()
+            raise
+
+    def close(self):
+        if self.sock != None:
+            if self.rfile is not self.sock:
+                self.rfile.close()
+            self.sock.close()
+        self.sock = None
+        self.rfile = None
+
+    def disconnect(self):
+        """Closes the connection cleanly, the broker keeps the session"""
+        if self.sock != None:
+            try:
+                self._send(bytes((DISCONNECT, 0)))
+            except OSError:
+                pass
+        self.close()
+
+    def _send(self, data):
+        if hasattr(self.sock, "sendall"):
+            self.sock.sendall(data)
+        else:
+            self.sock.write(data)
+        self.last_send = ticks_ms()
+
+    def _read(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.rfile.read(size - len(data))
+            if not chunk:
+                raise OSError("connection closed by broker")
+            data = data + chunk
+        return data
+
+    def _read_packet(self):
+        kind = self._read(1)[0]
+        length = 0
+        shift = 0
+        while True:
+            b = self._read(1)[0]
+            length = length | ((b & 0x7F) << shift)
+            shift = shift + 7
+            if b & 0x80 == 0:
+                break
+        return kind & 0xF0, self._read(length) if length > 0 else b""
+
+    def _publish(self, packet_id, topic, payload, flags=0):
+        header = bytes((PUBLISH | QOS1 | flags,)) + _length(2 + len(topic) + 2 + len(payload))
+        n = len(header)
+        self.buf[0:n] = header
+        self.buf[n:n + 2] = bytes((len(topic) >> 8, len(topic) & 0xFF))
+        n = n + 2
+        self.buf[n:n + len(topic)] = topic
+        n = n + len(topic)
+        self.buf[n:n + 2] = bytes((packet_id >> 8, packet_id & 0xFF))
+        n = n + 2
+        if n + len(payload) <= len(self.buf): # Header and payload in one write
+            self.buf[n:n + len(payload)] = payload
+            self._send(self.mv[:n + len(payload)])
+        else:
+            self._send(self.mv[:n])
+            self._send(payload)
+
+    def _handle(self):
+        # Reads one packet from the broker, returns its type
+        kind, body = self._read_packet()
+        if kind == PUBACK:
+            packet_id = (body[0] << 8) | body[1]
+            for i in range(len(self.inflight)):
+                if self.inflight[i][0] == packet_id:
+                    del self.inflight[i]
+                    self.acked = self.acked + 1
+                    break
+        return kind
+
+    def publish(self, topic, payload):
+        """Publishes with QoS 1 without waiting for the PUBACK, returns the packet ID
+
+        topic must be bytes. Blocks on acknowledgements while max_inflight
+        publishes are outstanding.
+        """
+        if type(payload) is str:
+            payload = payload.encode()
+        try:
+            if self.sock == None:
+                self.connect()
+            while len(self.inflight) >= self.max_inflight:
+                self._handle()
+            packet_id = self.next_id
+            self.next_id = packet_id % 65535 + 1
+            self._publish(packet_id, topic, payload)
+            self.inflight.append([packet_id, topic, payload]) # A failed send stays with the caller, not in both places
+        except:
+            self.close()
+            raise
+        self.published = self.published + 1
+        return packet_id
+
+    def wait(self, packet_id=None):
+        """Waits for the PUBACK of packet_id, or of every publish when None
+
+        Reconnects first when the connection was lost, which resends what
+        is still unacknowledged.
+        """
+        try:
+            if self.sock == None and len(self.inflight) > 0:
+                self.connect()
+            while len(self.inflight) > 0:
+                if packet_id != None and all(m[0] != packet_id for m in self.inflight):
+                    return
+                self._handle()
+        except:
+            self.close()
+            raise
+
+    def ping(self):
+        """Sends a PINGREQ when nothing was sent for half the keepalive period"""
+        if self.sock == None or ticks_diff(ticks_ms(), self.last_send) < self.keepalive * 500:
+            return
+        try:
+            self._send(bytes((PINGREQ, 0)))
+            while self._handle() != PINGRESP:
+                pass
+        except:
+            self.close()
+            raise
+
+class MQTTUploader(Uploader):
+    """Uploader publishing readings to an MQTT broker instead of POSTing them
+
+    Readings are queued and batched like with the HTTP uploader. Every batch
+    is published with QoS 1 to <topic>/<station ID>/data, with a suffix for
+    the binary formats. flush() pipelines the batches and then waits for
+    their acknowledgements. A batch leaves the queue once it is published,
+    until it is acknowledged it waits in the client, which sends it again
+    after a reconnect, so the server may see a batch twice and can drop the
+    duplicates by station ID and timestamp. poll() keeps the connection alive
+    and reconnects to resend unacknowledged batches.
+    """
+
+    def __init__(self, url, station_id, topic="ftw/weather", keepalive=60, max_inflight=8, user=None, password=None,
+                 batch_size=1, batch_age=0, max_queue=0, verbose=True, fmt="json"):
+        self.client = MQTTClient(url, "ftw-" + str(station_id), keepalive=keepalive, user=user, password=password, max_inflight=max_inflight)
+        super().__init__(url, batch_size=batch_size, batch_age=batch_age, max_queue=max_queue, verbose=verbose, fmt=fmt)
+        self.topic = (topic + "/" + str(station_id) + TOPICS[fmt]).encode()
+        self.last_attempt = ticks_ms()
+
+    def open_session(self):
+        # Publishes go through self.client, connected on the first publish
+        return None
+
+    def payload(self, body, count=None):
+        # A copy of the body, publishes are kept until they are acknowledged
+        return bytes(self.encode(body, count)[0])
+
+    def post(self, body, count=None):
+        """Publishes one message and waits for its acknowledgement, returns (200, "")"""
+        self.client.wait(self.client.publish(self.topic, self.payload(body, count)))
+        return 200, ""
+
+    def flush(self):
+        """Publishes all queued readings, one batch per message
+
+        Returns True when every published batch was acknowledged. On a
+        failure the batches not published yet stay queued.
+        """
+        self.last_attempt = ticks_ms()
+        sent = 0
+        try:
+            while len(self.queue) > 0:
+                count = min(self.batch_size, len(self.queue))
+                if self.batch_size == 1:
+                    body = self.queue[0]
+                else:
+                    body = self.queue
+                self.client.publish(self.topic, self.payload(body, count))
+                self.done(count)
+                sent = sent + count
+            self.client.wait()
+        except OSError as e:
+            print("WARNING: Failed to publish readings: " + str(e) + ", " + str(len(self.client.inflight)) + " unacknowledged messages are sent again")
+            self.failures = self.failures + 1
+            return False
+        if self.verbose:
+            print("INFO: " + str(sent) + " readings acknowledged by " + self.url)
+        self.failures = 0
+        return True
+
+    def unacknowledged(self):
+        """Takes the unacknowledged messages out of the client, returns their readings
+
+        For a station about to lose the session, such as before deep sleep.
+        """
+        records = []
+        for message in self.client.inflight:
+            if self.format == "json":
+                body = json.loads(message[2])
+                if type(body) is dict:
+                    records.append(body)
+                else:
+                    records.extend(body)
+            else:
+                records.extend(wire.decode(message[2]))
+        self.client.inflight = []
+        return records
+
+    def poll(self):
+        """Pings the broker when idle, reconnects to resend unacknowledged messages"""
+        client = self.client
+        try:
+            if client.sock == None:
+                # At most one reconnect per keepalive period
+                if len(client.inflight) > 0 and ticks_diff(ticks_ms(), self.last_attempt) >= client.keepalive * 1000:
+                    self.last_attempt = ticks_ms()
+                    client.connect()
+                    client.wait()
+                    self.failures = 0
+            else:
+                client.ping()
+        except OSError as e:
+            print("WARNING: MQTT connection failed: " + str(e))
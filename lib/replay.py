@@ -0,0 +1,58 @@
+#
+# Fetch The Weather: Weather stations
+# Backlog replay
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+import time
+
+class Replay:
+    """Sends readings stored in the log to the server once the station is online
+
+    Every step sends at most one chunk of the oldest logged readings as a JSON
+    array, and steps closer together than interval seconds do nothing, so the
+    backlog drains in the background of the live readings. Sent readings are
+    only dropped from the log after the server accepted them, and the log
+    keeps its read position across reboots. A reboot between the server
+    accepting a chunk and the log being updated sends that chunk again, the
+    server can recognise the duplicates by station ID and timestamp.
+    """
+
+    def __init__(self, logfile, uploader, to_dict, chunk=20, interval=60):
+        self.logfile = logfile
+        self.uploader = uploader
+        self.to_dict = to_dict
+        self.chunk = chunk
+        self.interval = interval
+        self.last = None
+        self.sent = 0
+
+    def pending(self):
+        return len(self.logfile)
+
+    def step(self, now=None):
+        """Sends one chunk of the backlog if one is due, returns the number of readings sent"""
+        if len(self.logfile) == 0:
+            return 0
+        if now == None:
+            now = time.time()
+        if self.last != None and now - self.last < self.interval:
+            return 0
+        self.last = now
+        records = [self.to_dict(r) for r in self.logfile.read(self.chunk)]
+        try:
+            status, text = self.uploader.post(records)
+        except OSError as e:
+            print("WARNING: Failed to replay logged readings: " + str(e))
+            return 0
+        if status != 200:
+            print("WARNING: " + str(status) + " when replaying logged readings")
+            return 0
+        self.logfile.consume(len(records))
+        self.sent = self.sent + len(records)
+        print("INFO: Replayed " + str(len(records)) + " logged readings, " + str(len(self.logfile)) + " left")
+        return len(records)
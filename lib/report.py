@@ -0,0 +1,86 @@
+#
+# Fetch The Weather: Weather stations
+# Report-by-exception filter
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+class Reporter:
+    """Decides which readings are worth sending
+
+    A reading is sent when a field leaves its deadband around the value the
+    server would predict from the readings it already has, or when heartbeat
+    seconds have passed since the last reading sent. deadband maps record
+    fields to {"abs": ..., "rel": ...}, the larger of the absolute band and
+    the relative band around the prediction applies. With predict "hold" the
+    prediction is the last value sent, with "linear" it is extrapolated from
+    the last two. Each reading sent carries "suppressed", the number of
+    readings dropped since the one before it.
+    """
+
+    def __init__(self, deadband, heartbeat=900, predict="hold"):
+        self.deadband = deadband
+        self.heartbeat = heartbeat
+        self.linear = predict == "linear"
+        self.last = None # Last reading sent
+        self.prev = None # Reading sent before the last one
+        self.suppressed = 0
+        self.sent = 0
+        self.total_suppressed = 0
+
+    def predict(self, field, timestamp):
+        last = self.last[field]
+        if self.linear and self.prev != None:
+            dt = self.last["timestamp"] - self.prev["timestamp"]
+            if dt > 0:
+                return last + (last - self.prev[field]) * (timestamp - self.last["timestamp"]) / dt
+        return last
+
+    def exceeded(self, record):
+        for field in self.deadband:
+            value = record.get(field)
+            if value == None:
+                continue
+            band = self.deadband[field]
+            predicted = self.predict(field, record["timestamp"])
+            if abs(value - predicted) > max(band.get("abs", 0), band.get("rel", 0) * abs(predicted)):
+                return True
+        return False
+
+    def check(self, record):
+        """Returns True when the reading should be sent"""
+        if self.last == None or record["timestamp"] - self.last["timestamp"] >= self.heartbeat or self.exceeded(record):
+            record["suppressed"] = self.suppressed
+            self.suppressed = 0
+            # Copied, the caller reuses its record, and the dict of the reading before last is reused
+            spare = self.prev
+            self.prev = self.last
+            if spare == None:
+                spare = {}
+            spare.update(record)
+            self.last = spare
+            self.sent = self.sent + 1
+            return True
+        self.suppressed = self.suppressed + 1
+        self.total_suppressed = self.total_suppressed + 1
+        return False
+
+    def state(self):
+        """Returns what the filter needs to go on after a deep sleep, small enough for RTC memory"""
+        kept = []
+        for reading in (self.last, self.prev):
+            if reading == None:
+                kept.append(None)
+                continue
+            slim = {"timestamp": reading["timestamp"]}
+            for field in self.deadband:
+                if field in reading:
+                    slim[field] = reading[field]
+            kept.append(slim)
+        return [kept[0], kept[1], self.suppressed]
+
+    def restore(self, state):
+        self.last, self.prev, self.suppressed = state
@@ -0,0 +1,223 @@
+#
+# Fetch The Weather: Weather stations
+# Fixed-size binary reading log
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+import os
+from array import array
+
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+MAGIC = b"FTWL"
+
+# Header: magic, sequence, capacity, head, tail, check
+HEADER = "<4sIIIII"
+HEADER_SIZE = 24
+# Two header slots are written alternately so one of them is always intact
+DATA_START = HEADER_SIZE * 2
+
+# Record: timestamp, temperature, humidity, ppm, pressure
+RECORD = "<Iffff"
+RECORD_SIZE = 20
+
+# Records per block of the sparse timestamp index
+INDEX_BLOCK = 64
+
+def _check(seq, capacity, head, tail):
+    return (seq ^ capacity ^ head ^ tail ^ 0x5A5A5A5A) & 0xFFFFFFFF
+
+class RingLog:
+    """Stores readings as fixed-size records in a preallocated circular file
+
+    head and tail are running record counters, the record with counter n is
+    stored in slot n % capacity. Appending writes the record first and then
+    the header, so a power loss in between only loses the reading being
+    written. When the log is full the oldest record is dropped first.
+
+    Time range queries binary search a sparse index holding the timestamp of
+    every INDEX_BLOCK-th record, then the records of one block in the file.
+    The index is built on the first query and kept up to date by append().
+    Queries assume timestamps do not go backwards, readings taken before the
+    clock was set can make a query start late.
+    """
+
+    def __init__(self, path, capacity=4096):
+        self.path = path
+        self.capacity = capacity
+        self.seq = 0
+        self.head = 0
+        self.tail = 0
+        self.file = None
+        self.hbuf = bytearray(HEADER_SIZE)
+        self.rbuf = bytearray(RECORD_SIZE)
+        self.tbuf = bytearray(4)
+        self.index = None # Timestamp of record n * INDEX_BLOCK in slot n % len(index)
+
+    def open(self):
+        try:
+            self.file = open(self.path, "r+b")
+        except OSError:
+            self._create()
+            return
+        if self._load() == False:
+            self.file.close()
+            print("WARNING: " + self.path + " is not a valid log, moving it to " + self.path + ".bak")
+            try:
+                os.remove(self.path + ".bak")
+            except OSError:
+                pass
+            os.rename(self.path, self.path + ".bak")
+            self._create()
+        self.index = None
+
+    def close(self):
+        if self.file != None:
+            self.file.close()
+            self.file = None
+
+    def _create(self):
+        self.file = open(self.path, "w+b")
+        self.seq = 0
+        self.head = 0
+        self.tail = 0
+        # Preallocate the whole file so later writes never grow it
+        self.file.write(bytes(DATA_START))
+        block = bytes(RECORD_SIZE * 16)
+        left = self.capacity
+        while left > 0:
+            n = min(left, 16)
+            self.file.write(block[:n * RECORD_SIZE])
+            left = left - n
+        self._write_header()
+        self._write_header()
+
+    def _load(self):
+        best = None
+        for slot in (0, 1):
+            self.file.seek(slot * HEADER_SIZE)
+            if self.file.readinto(self.hbuf) != HEADER_SIZE:
+                continue
+            magic, seq, capacity, head, tail, check = struct.unpack(HEADER, self.hbuf)
+            if magic != MAGIC or check != _check(seq, capacity, head, tail):
+                continue
+            if best == None or seq > best[0]:
+                best = (seq, capacity, head, tail)
+        if best == None:
+            return False
+        self.seq, self.capacity, self.head, self.tail = best
+        return True
+
+    def _write_header(self):
+        self.seq = self.seq + 1
+        struct.pack_into(HEADER, self.hbuf, 0, MAGIC, self.seq, self.capacity, self.head, self.tail,
+                         _check(self.seq, self.capacity, self.head, self.tail))
+        self.file.seek((self.seq & 1) * HEADER_SIZE)
+        self.file.write(self.hbuf)
+        self.file.flush()
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def append(self, timestamp, temp, humidity, ppm, pressure):
+        if self.head - self.tail >= self.capacity:
+            # Commit dropping the oldest record before its slot is overwritten
+            self.tail = self.head - self.capacity + 1
+            self._write_header()
+        struct.pack_into(RECORD, self.rbuf, 0, int(timestamp), temp, humidity, ppm, pressure)
+        self.file.seek(DATA_START + (self.head % self.capacity) * RECORD_SIZE)
+        self.file.write(self.rbuf)
+        if self.index != None and self.head % INDEX_BLOCK == 0:
+            self.index[(self.head // INDEX_BLOCK) % len(self.index)] = int(timestamp)
+        self.head = self.head + 1
+        self._write_header()
+
+    def read(self, count, offset=0):
+        """Yields up to count records, oldest first, starting offset records after the tail"""
+        index = self.tail + offset
+        end = min(self.head, index + count)
+        while index < end:
+            self.file.seek(DATA_START + (index % self.capacity) * RECORD_SIZE)
+            self.file.readinto(self.rbuf)
+            yield struct.unpack(RECORD, self.rbuf)
+            index = index + 1
+
+    def _timestamp(self, index):
+        self.file.seek(DATA_START + (index % self.capacity) * RECORD_SIZE)
+        self.file.readinto(self.tbuf)
+        return struct.unpack_from("<I", self.tbuf)[0]
+
+    def _build_index(self):
+        # Slots for every block that can hold live records, plus one being filled
+        self.index = array('I', bytes(4 * (self.capacity // INDEX_BLOCK + 2)))
+        for block in range((self.tail + INDEX_BLOCK - 1) // INDEX_BLOCK, (self.head + INDEX_BLOCK - 1) // INDEX_BLOCK):
+            self.index[block % len(self.index)] = self._timestamp(block * INDEX_BLOCK)
+
+    def find(self, timestamp):
+        """Returns the counter of the first record at or after timestamp, head when there is none"""
+        if self.index == None:
+            self._build_index()
+        lo = self.tail
+        hi = self.head
+        first = (lo + INDEX_BLOCK - 1) // INDEX_BLOCK
+        last = (hi - 1) // INDEX_BLOCK
+        while first <= last and hi > lo:
+            mid = (first + last) // 2
+            if self.index[mid % len(self.index)] < timestamp:
+                lo = mid * INDEX_BLOCK + 1
+                first = mid + 1
+            else:
+                hi = mid * INDEX_BLOCK
+                last = mid - 1
+        while lo < hi: # At most one block left, searched in the file
+            mid = (lo + hi) // 2
+            if self._timestamp(mid) < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def query(self, start, end=None):
+        """Yields the records with start <= timestamp < end, oldest first
+
+        Records are read one at a time into the same buffer, so a query over
+        the whole log needs no more memory than a single record.
+        """
+        index = self.find(start)
+        while index < self.head:
+            self.file.seek(DATA_START + (index % self.capacity) * RECORD_SIZE)
+            self.file.readinto(self.rbuf)
+            record = struct.unpack(RECORD, self.rbuf)
+            if end != None and record[0] >= end:
+                return
+            yield record
+            index = index + 1
+
+    def export(self, count=20, start=0, end=None):
+        """Yields the records from start to end as lists of up to count records"""
+        batch = []
+        for record in self.query(start, end):
+            batch.append(record)
+            if len(batch) == count:
+                yield batch
+                batch = []
+        if len(batch) > 0:
+            yield batch
+
+    def dump(self, start=0, end=None):
+        """Prints the records from start to end as CSV, for the serial console"""
+        print("timestamp,temperature,humidity,ppm,pressure")
+        for record in self.query(start, end):
+            print("%d,%.2f,%.2f,%.2f,%.2f" % record)
+
+    def consume(self, count):
+        """Drops the oldest count records"""
+        self.tail = min(self.head, self.tail + count)
+        self._write_header()
@@ -0,0 +1,132 @@
+#
+# Fetch The Weather: Weather stations
+# asyncio station runtime
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+import gc
+
+from ticks import ticks_ms, ticks_diff, ticks_add
+
+async def sleep_ms(ms):
+    if hasattr(asyncio, "sleep_ms"):
+        await asyncio.sleep_ms(ms)
+    else:
+        await asyncio.sleep(ms / 1000)
+
+class Runtime:
+    """Runs sampling, uploading, backlog replay and network supervision as tasks
+
+    Samples are taken on a fixed grid of period seconds counted from the
+    start, so a late sample never moves the ones after it. Network requests
+    still block, so the upload and replay tasks only start one when at least
+    window_ms remain before the next sample is due. link is called to check
+    the network and returns True while the station is online. The sampler
+    copies each reading into the upload queue, which wakes the upload task,
+    and runs the garbage collector before it sleeps. With adaptive set the
+    period is the interval it returns after each sample.
+    """
+
+    def __init__(self, data, uploader, replay, log, link, period=60, link_interval=1, window_ms=15000, report=None, adaptive=None):
+        self.data = data
+        self.uploader = uploader
+        self.replay = replay
+        self.log = log
+        self.link = link
+        self.report = report # Returns False for readings that are not sent
+        self.adaptive = adaptive
+        self.period_ms = int(period * 1000)
+        self.link_interval_ms = int(link_interval * 1000)
+        self.max_window_ms = window_ms
+        self.window_ms = min(window_ms, self.period_ms // 2)
+        self.added = asyncio.Event() # Set when a reading was queued for upload
+        self.online = False
+        self.next_sample = ticks_ms()
+        self.samples = 0
+        self.late_ms = 0 # Largest delay of a sample behind its slot
+
+    def idle(self):
+        """Returns True when a blocking request fits before the next sample"""
+        return ticks_diff(self.next_sample, ticks_ms()) >= self.window_ms
+
+    async def wait_idle(self):
+        while self.idle() == False:
+            await sleep_ms(max(100, ticks_diff(self.next_sample, ticks_ms()) + 100))
+
+    async def sampler(self):
+        self.next_sample = ticks_ms()
+        while True:
+            late = ticks_diff(ticks_ms(), self.next_sample)
+            if late > self.late_ms:
+                self.late_ms = late
+            self.data.interval = self.period_ms // 1000
+            self.data.collect()
+            record = self.data.get_dict()
+            self.samples = self.samples + 1
+            if self.report != None and self.report(record) == False:
+                pass
+            elif self.online:
+                for overflow in self.uploader.add(record): # Copied, the record is reused by the next sample
+                    self.log(overflow)
+                self.added.set()
+            else:
+                self.log(record)
+            if self.adaptive != None:
+                self.period_ms = self.adaptive.update(record) * 1000
+                self.window_ms = min(self.max_window_ms, self.period_ms // 2)
+            gc.collect() # In the idle time after the sample rather than during the next one
+            self.next_sample = ticks_add(self.next_sample, self.period_ms)
+            delay = ticks_diff(self.next_sample, ticks_ms())
+            if delay < 0: # Missed slots are skipped instead of sampled in a burst
+                skipped = (-delay) // self.period_ms + 1
+                self.next_sample = ticks_add(self.next_sample, skipped * self.period_ms)
+                delay = ticks_diff(self.next_sample, ticks_ms())
+            await sleep_ms(delay)
+
+    async def uploader_task(self):
+        while True:
+            await self.added.wait()
+            self.added.clear()
+            if self.uploader.due():
+                await self.wait_idle()
+                self.online = self.link() # Catches a lost link before uploading
+                if self.online == False:
+                    continue
+                if self.uploader.flush() == False:
+                    print("WARNING: An error occured when sending request. Keeping readings queued...")
+
+    async def backlog(self):
+        while True:
+            await sleep_ms(int(self.replay.interval * 1000))
+            if self.online and self.uploader.failures == 0 and self.replay.pending() > 0:
+                await self.wait_idle()
+                self.online = self.link()
+                if self.online:
+                    self.replay.step()
+
+    async def network(self):
+        while True:
+            self.online = self.link()
+            if self.online:
+                self.uploader.poll() # Keepalive and resend of unacknowledged messages
+            if self.adaptive == None or self.data.aggregator != None:
+                self.data.sensors.poll() # Sensors with a shorter interval than the period keep their own pace
+            await sleep_ms(self.link_interval_ms)
+
+    async def main(self):
+        self.online = self.link()
+        tasks = [asyncio.create_task(self.network()), asyncio.create_task(self.sampler()),
+                 asyncio.create_task(self.uploader_task()), asyncio.create_task(self.backlog())]
+        await asyncio.gather(*tasks)
+
+    def run(self):
+        asyncio.run(self.main())
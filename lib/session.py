@@ -0,0 +1,205 @@
+#
+# Fetch The Weather: Weather stations
+# Persistent HTTP/1.1 client session
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+try:
+    import usocket as socket
+except ImportError:
+    import socket
+
+try:
+    import ussl as ssl
+except ImportError:
+    import ssl
+
+try:
+    import uerrno as errno
+except ImportError:
+    import errno
+
+from ticks import ticks_ms, ticks_diff
+
+class StaleConnection(OSError):
+    """The request never reached the server, a new connection can retry it safely"""
+    pass
+
+class Session:
+    """Keeps one HTTP/1.1 keep-alive connection open to a single server
+
+    The connection is opened on the first request and reused for the
+    following ones. When a write on the reused socket fails, or the server
+    closes or resets it before answering, the session reconnects and retries
+    the request once. Any other error, such as a timeout waiting for the
+    response, is raised, the request may have been processed. Response
+    bodies are always read to the end so the socket is ready for the next
+    request. Both https:// and plain http:// URLs are supported, the latter
+    for testing against a local stand-in server.
+    """
+
+    def __init__(self, url, timeout=10, buffer_size=512):
+        scheme, _, host, path = url.split("/", 3)
+        self.tls = scheme == "https:"
+        if ":" in host:
+            host, port = host.split(":", 1)
+            self.port = int(port)
+        elif self.tls:
+            self.port = 443
+        else:
+            self.port = 80
+        self.host = host
+        self.path = "/" + path
+        self.timeout = timeout
+        self.sock = None
+        self.rfile = None
+        # Request line and fixed headers are written once, the variable headers
+        # are written into the rest of the buffer on every request
+        self.buf = bytearray(buffer_size)
+        self.mv = memoryview(self.buf)
+        self.prefix_len = self._put(0, "POST " + self.path + " HTTP/1.1\r\nHost: " + host + "\r\nConnection: keep-alive\r\n")
+        # Statistics
+        self.connections = 0
+        self.requests = 0
+        self.last_latency_ms = 0
+        self.total_latency_ms = 0
+
+    def _put(self, pos, s):
+        b = s.encode() if type(s) is str else s
+        end = pos + len(b)
+        self.buf[pos:end] = b
+        return end
+
+    def connect(self):
+        addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+        sock = socket.socket()
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(addr)
+            if hasattr(socket, "TCP_NODELAY"):
+                # Headers and a large body go out in two writes, Nagle would hold back the body
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.tls:
+                if hasattr(ssl, "create_default_context"): # CPython
+                    sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.host)
+                else:
+                    sock = ssl.wrap_socket(sock, server_hostname=self.host)
+        except:
+            sock.close()
+            raise
+        self.sock = sock
+        if hasattr(sock, "makefile"):
+            self.rfile = sock.makefile("rb")
+        else:
+            self.rfile = sock
+        self.connections = self.connections + 1
+
+    def close(self):
+        if self.sock != None:
+            if self.rfile is not self.sock:
+                self.rfile.close()
+            self.sock.close()
+        self.sock = None
+        self.rfile = None
+
+    def _send(self, data):
+        if hasattr(self.sock, "sendall"):
+            self.sock.sendall(data)
+        else:
+            self.sock.write(data)
+
+    def _exchange(self, body, content_type):
+        n = self._put(self.prefix_len, "Content-Type: " + content_type + "\r\nContent-Length: " + str(len(body)) + "\r\n\r\n")
+        try:
+            if n + len(body) <= len(self.buf): # Small bodies go out in the same write as the headers
+                n = self._put(n, body)
+                self._send(self.mv[:n])
+            else:
+                self._send(self.mv[:n])
+                self._send(body)
+        except OSError as e:
+            raise StaleConnection(str(e))
+        try:
+            line = self.rfile.readline()
+        except OSError as e:
+            if e.args[0] == errno.ECONNRESET: # Reset before any reply, like the closed connection below
+                raise StaleConnection(str(e))
+            raise
+        if not line: # A keep-alive connection the server closed while idle
+            raise StaleConnection("connection closed by server")
+        try:
+            status = int(line.split(None, 2)[1])
+        except (ValueError, IndexError):
+            raise OSError("malformed status line from server")
+        length = -1
+        chunked = False
+        keep_alive = True
+        while True:
+            line = self.rfile.readline()
+            if not line or line == b"\r\n":
+                break
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            value = value.strip().lower()
+            if name == b"content-length":
+                length = int(value)
+            elif name == b"transfer-encoding" and value == b"chunked":
+                chunked = True
+            elif name == b"connection" and value == b"close":
+                keep_alive = False
+        if chunked:
+            text = b""
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                text = text + self._read(size)
+                self.rfile.readline()
+        elif length >= 0:
+            text = self._read(length)
+        else: # No length given, the body ends when the server closes the connection
+            text = self.rfile.read()
+            keep_alive = False
+        if keep_alive == False:
+            self.close()
+        return status, text.decode()
+
+    def _read(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.rfile.read(size - len(data))
+            if not chunk:
+                raise OSError("connection closed by server")
+            data = data + chunk
+        return data
+
+    def post(self, body, content_type="application/json"):
+        """Sends a POST request, returns the status code and response text"""
+        if type(body) is str:
+            body = body.encode()
+        start = ticks_ms()
+        reused = self.sock != None
+        try:
+            if reused == False:
+                self.connect()
+            try:
+                result = self._exchange(body, content_type)
+            except StaleConnection:
+                if reused == False:
+                    raise
+                # The server may have dropped the idle connection, try a new one
+                self.close()
+                self.connect()
+                result = self._exchange(body, content_type)
+        except:
+            self.close()
+            raise
+        self.last_latency_ms = ticks_diff(ticks_ms(), start)
+        self.total_latency_ms = self.total_latency_ms + self.last_latency_ms
+        self.requests = self.requests + 1
+        return result
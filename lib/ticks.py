@@ -0,0 +1,38 @@
+#
+# Fetch The Weather: Weather stations
+# Millisecond/microsecond tick helpers
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# MicroPython provides wrapping tick counters in the time module, CPython does
+# not. The fallbacks let the station code run on a host for testing.
+
+import time
+
+try:
+    from time import ticks_ms, ticks_us, ticks_diff, ticks_add
+except ImportError:
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def ticks_us():
+        return int(time.monotonic() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+    def ticks_add(a, b):
+        return a + b
+
+try:
+    from time import sleep_ms, sleep_us
+except ImportError:
+    def sleep_ms(ms):
+        time.sleep(ms / 1000)
+
+    def sleep_us(us):
+        time.sleep(us / 1000000)
@@ -0,0 +1,201 @@
+#
+# Fetch The Weather: Weather stations
+# Batched upload queue
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+import time, json
+
+from session import Session
+import wire
+
+class Buffer:
+    """Reusable request body, grows to the largest body sent and stays there
+
+    view() returns the bytes written since the last reset().
+    """
+
+    def __init__(self, size=512):
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.n = 0
+
+    def reset(self):
+        self.n = 0
+
+    def reserve(self, size):
+        if size > len(self.buf):
+            self.buf = self.buf + bytearray(max(size, 2 * len(self.buf)) - len(self.buf))
+            self.mv = memoryview(self.buf)
+
+    def write(self, data):
+        if type(data) is str:
+            data = data.encode()
+        end = self.n + len(data)
+        self.reserve(end)
+        self.buf[self.n:end] = data
+        self.n = end
+        return len(data)
+
+    def view(self):
+        return self.mv[:self.n]
+
+class Uploader:
+    """Collects readings in memory and POSTs them to the server in batches
+
+    With a batch size of 1 every reading is sent on its own as a single JSON
+    object (the original behaviour). With a larger batch size readings are
+    sent as one JSON array per request once the batch is full or the oldest
+    queued reading is older than batch_age seconds.
+
+    fmt selects the request body: "json", or the binary encoding from wire.py
+    as "binary" or "binary+deflate". A server answering 415 to a binary body
+    does not accept it, the uploader then falls back to JSON for good.
+
+    add() copies each reading into a slot dict taken from a pool, so the
+    caller can reuse its record, and bodies are serialized into one reused
+    buffer. Once the queue has been full the steady state allocates no
+    new slots.
+    """
+
+    def __init__(self, url, batch_size=1, batch_age=0, max_queue=0, verbose=True, fmt="json"):
+        self.url = url
+        self.session = self.open_session()
+        self.format = fmt
+        self.batch_size = max(1, batch_size)
+        self.batch_age = batch_age
+        if max_queue < self.batch_size:
+            max_queue = self.batch_size * 4
+        self.max_queue = max_queue
+        self.queue = []
+        self.free = [] # Slot dicts of sent readings, reused by add()
+        self.body = Buffer()
+        self.single = [None] # Wraps a single reading for the binary encoding
+        self.oldest = None # Time the oldest queued reading was added
+        self.failures = 0 # Failed flushes since the last successful one
+        self.verbose = verbose # Print every accepted batch
+
+    def open_session(self):
+        """Returns the connection requests are sent on, other transports override it"""
+        return Session(self.url)
+
+    def add(self, record, now=None):
+        """Queues a reading, returns the readings pushed out of a full queue"""
+        if now == None:
+            now = time.time()
+        if len(self.queue) == 0:
+            self.oldest = now
+        if len(self.free) > 0:
+            slot = self.free.pop()
+            for key in slot:
+                if key not in record: # Extra keys of an earlier reading, such as "health"
+                    slot.clear()
+                    break
+        else:
+            slot = {}
+        slot.update(record)
+        self.queue.append(slot)
+        if len(self.queue) <= self.max_queue:
+            return ()
+        overflow = []
+        while len(self.queue) > self.max_queue:
+            overflow.append(self.queue.pop(0))
+        return overflow
+
+    def done(self, count):
+        """Drops the first count queued readings, their slots go back to the pool"""
+        for i in range(count):
+            self.free.append(self.queue[i])
+        del self.queue[:count]
+
+    def due(self, now=None):
+        """Returns True when the queued readings should be sent"""
+        if len(self.queue) == 0:
+            return False
+        if len(self.queue) >= self.batch_size:
+            return True
+        if now == None:
+            now = time.time()
+        return now - self.oldest >= self.batch_age
+
+    def encode(self, body, count=None):
+        """Serializes a reading or a list of readings, returns the body and its content type
+
+        With count only the first count readings of the list are sent. The
+        body is a view of the reused buffer and only valid until the next call.
+        """
+        if type(body) is list and (count == None or count > len(body)):
+            count = len(body)
+        if self.format == "json":
+            self.body.reset()
+            if type(body) is not list:
+                self.body.write(json.dumps(body)) # Text of the numbers needs a string either way
+            else:
+                # Element by element, the same text as json.dumps() of the first count readings
+                self.body.write("[")
+                for i in range(count):
+                    if i > 0:
+                        self.body.write(", ")
+                    self.body.write(json.dumps(body[i]))
+                self.body.write("]")
+            return self.body.view(), "application/json"
+        if type(body) is not list:
+            self.single[0] = body
+            body = self.single
+            count = 1
+        if self.format == "binary+deflate":
+            return wire.encode(body, True, count), wire.CONTENT_TYPE_DEFLATE
+        self.body.reserve(wire.size(count))
+        self.body.n = wire.encode_into(self.body.buf, body, count)
+        return self.body.view(), wire.CONTENT_TYPE
+
+    def post(self, body, count=None):
+        """Sends one request, returns the status code and response text"""
+        if self.format != "json":
+            status, text = self.session.post(*self.encode(body, count))
+            if status != 415:
+                return status, text
+            print("WARNING: Server does not accept " + self.format + " readings, falling back to JSON")
+            self.format = "json"
+        return self.session.post(*self.encode(body, count))
+
+    def flush(self):
+        """Sends all queued readings, one batch per request
+
+        Batches that were accepted are removed from the queue. On the first
+        failed batch sending stops and that batch and everything after it stays
+        queued for the next flush. Returns True when the queue was emptied.
+        """
+        while len(self.queue) > 0:
+            count = min(self.batch_size, len(self.queue))
+            if self.batch_size == 1:
+                body = self.queue[0]
+            else:
+                body = self.queue
+            try:
+                status, text = self.post(body, count)
+            except OSError as e:
+                print("WARNING: Failed to send request: " + str(e))
+                self.failures = self.failures + 1
+                return False
+            if status != 200:
+                print("WARNING: " + str(status) + " from " + self.url + ", keeping " + str(len(self.queue)) + " queued readings")
+                self.failures = self.failures + 1
+                return False
+            if self.verbose:
+                print("INFO: 200 from " + self.url + ": " + text)
+            self.done(count)
+        self.failures = 0
+        return True
+
+    def poll(self):
+        """Called every second while online, HTTP connections need nothing"""
+        pass
+
+    def unacknowledged(self):
+        """Takes out the readings sent but not acknowledged yet, none over HTTP"""
+        return ()
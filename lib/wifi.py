@@ -0,0 +1,129 @@
+#
+# Fetch The Weather: Weather stations
+# Wi-Fi supervisor
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+import random
+
+from ticks import ticks_ms, ticks_diff, ticks_add
+
+# Connection states
+DOWN = "DOWN"
+CONNECTING = "CONNECTING"
+UP = "UP"
+BACKOFF = "BACKOFF"
+
+class WifiSupervisor:
+    """Keeps the station connected to Wi-Fi without ever blocking
+
+    poll() advances a small state machine and returns True while the link is
+    up. A connect attempt that does not succeed within connect_timeout_ms is
+    abandoned and retried after an exponential backoff with random jitter,
+    starting at backoff_min_ms and capped at backoff_max_ms. A lost link is
+    reconnected straight away. on_up and on_down are called on the state
+    changes. bssid and channel of a known access point make the first
+    attempt skip the scan.
+    """
+
+    def __init__(self, wlan, ssid, psk, connect_timeout_ms=10000, backoff_min_ms=2000, backoff_max_ms=300000, bssid=None, channel=None, on_up=None, on_down=None):
+        self.wlan = wlan
+        self.ssid = ssid
+        self.psk = psk
+        self.connect_timeout_ms = connect_timeout_ms
+        self.backoff_min_ms = backoff_min_ms
+        self.backoff_max_ms = backoff_max_ms
+        self.bssid = bssid
+        self.channel = channel
+        self.on_up = on_up
+        self.on_down = on_down
+        self.state = DOWN
+        self.since = ticks_ms() # Time of the last state change
+        self.retry_at = 0
+        self.failures = 0 # Failed attempts in a row
+        # Metrics
+        self.attempts = 0
+        self.connects = 0
+        self.losses = 0
+        self.last_connect_ms = None # Time to connect of the last successful attempt
+        self.total_connect_ms = 0
+
+    def online(self):
+        return self.state == UP
+
+    def _set(self, state, now):
+        self.state = state
+        self.since = now
+
+    def _start(self, now):
+        if self.wlan.active() == False:
+            self.wlan.active(True)
+        self.attempts = self.attempts + 1
+        try:
+            if self.bssid != None and self.failures == 0:
+                # Joining the last access point directly skips the channel scan
+                if self.channel != None:
+                    try: self.wlan.config(channel=self.channel)
+                    except: pass
+                self.wlan.connect(self.ssid, self.psk, bssid=self.bssid)
+            else:
+                self.wlan.connect(self.ssid, self.psk)
+        except OSError as e:
+            print("WARNING: Wi-Fi connect failed: " + str(e))
+            self._backoff(now)
+            return
+        self._set(CONNECTING, now)
+
+    def _backoff(self, now):
+        self.failures = self.failures + 1
+        delay = min(self.backoff_max_ms, self.backoff_min_ms << min(self.failures - 1, 16))
+        delay = delay // 2 + random.randint(0, delay // 2) # Jitter keeps a fleet from retrying in step
+        self.retry_at = ticks_add(now, delay)
+        self._set(BACKOFF, now)
+
+    def poll(self, now=None):
+        if now == None:
+            now = ticks_ms()
+        if self.state == UP:
+            if self.wlan.isconnected() == False:
+                self.losses = self.losses + 1
+                self._set(DOWN, now)
+                if self.on_down != None:
+                    self.on_down()
+                self._start(now)
+        elif self.state == CONNECTING:
+            if self.wlan.isconnected() == True:
+                elapsed = ticks_diff(now, self.since)
+                self.last_connect_ms = elapsed
+                self.total_connect_ms = self.total_connect_ms + elapsed
+                self.connects = self.connects + 1
+                self.failures = 0
+                self._set(UP, now)
+                if self.on_up != None:
+                    self.on_up()
+            elif ticks_diff(now, self.since) >= self.connect_timeout_ms:
+                try: self.wlan.disconnect()
+                except: pass
+                self._backoff(now)
+        elif self.state == BACKOFF:
+            if ticks_diff(now, self.retry_at) >= 0:
+                self._start(now)
+        elif self.wlan.isconnected() == True: # Still connected from before a soft reset
+            self.connects = self.connects + 1
+            self._set(UP, now)
+            if self.on_up != None:
+                self.on_up()
+        else:
+            self._start(now)
+        return self.state == UP
+
+    def stats(self):
+        mean = None
+        if self.connects > 0:
+            mean = self.total_connect_ms // self.connects
+        return {"state": self.state, "attempts": self.attempts, "connects": self.connects, "losses": self.losses,
+                "lastConnectMs": self.last_connect_ms, "meanConnectMs": mean}
@@ -0,0 +1,129 @@
+#
+# Fetch The Weather: Weather stations
+# Compact binary reading encoding
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# A request body holds one station header followed by fixed-size records:
+#
+#   header  "<4sBIIH"  magic b"FTW1", flags, station ID, first timestamp, count
+#   record  "<Hhhff"   seconds since the previous reading, temperature in
+#                      0.01 C, humidity in 0.01 %, ppm, pressure
+#
+# A gap that does not fit in 16 bits is written as 0xFFFF followed by the
+# full timestamp as "<I". With FLAG_DEFLATE set everything after the header
+# is zlib compressed. Readings are sent as
+#   application/vnd.ftw.readings          uncompressed
+#   application/vnd.ftw.readings+deflate  compressed
+# Only the five measured fields are carried, other keys such as health
+# records, window statistics, suppressed counts and the sampling interval
+# need the JSON format.
+
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+try:
+    import deflate, io
+except ImportError:
+    deflate = None
+    import zlib
+
+MAGIC = b"FTW1"
+FLAG_DEFLATE = 1
+
+HEADER = "<4sBIIH"
+HEADER_SIZE = 15
+RECORD = "<Hhhff"
+RECORD_SIZE = 14
+LONG_GAP = 0xFFFF
+
+CONTENT_TYPE = "application/vnd.ftw.readings"
+CONTENT_TYPE_DEFLATE = "application/vnd.ftw.readings+deflate"
+
+def _compress(data):
+    if deflate == None:
+        return zlib.compress(data)
+    out = io.BytesIO()
+    d = deflate.DeflateIO(out, deflate.ZLIB)
+    d.write(data)
+    d.close()
+    return out.getvalue()
+
+def _decompress(data):
+    if deflate == None:
+        return zlib.decompress(data)
+    return deflate.DeflateIO(io.BytesIO(data), deflate.ZLIB).read()
+
+def size(count):
+    """Returns the largest body of count readings without compression"""
+    return HEADER_SIZE + count * (RECORD_SIZE + 4)
+
+def encode_into(buf, records, count=None):
+    """Encodes the first count reading dicts into buf without compression
+
+    buf must hold size(count) bytes. Nothing is allocated besides the
+    numbers, so a reused buffer keeps the upload path off the heap. Returns
+    the number of bytes written.
+    """
+    if count == None:
+        count = len(records)
+    first = int(records[0]["timestamp"])
+    struct.pack_into(HEADER, buf, 0, MAGIC, 0, int(records[0]["weatherStationId"]), first, count)
+    pos = HEADER_SIZE
+    last = first
+    for i in range(count):
+        record = records[i]
+        timestamp = int(record["timestamp"])
+        gap = timestamp - last
+        if gap < 0 or gap >= LONG_GAP:
+            struct.pack_into("<HI", buf, pos, LONG_GAP, timestamp)
+            pos = pos + 6
+            struct.pack_into("<hhff", buf, pos, round(record["temperatureCelsius"] * 100), round(record["humidityPercent"] * 100),
+                             record["airQualityPpm"], record["airPressureHpa"])
+            pos = pos + RECORD_SIZE - 2
+        else:
+            struct.pack_into(RECORD, buf, pos, gap, round(record["temperatureCelsius"] * 100), round(record["humidityPercent"] * 100),
+                             record["airQualityPpm"], record["airPressureHpa"])
+            pos = pos + RECORD_SIZE
+        last = timestamp
+    return pos
+
+def encode(records, compress=False, count=None):
+    """Encodes the first count reading dicts of a list from one station, returns the body"""
+    if count == None:
+        count = len(records)
+    buf = bytearray(size(count))
+    n = encode_into(buf, records, count)
+    if compress:
+        buf[4] = FLAG_DEFLATE
+        return bytes(buf[:HEADER_SIZE]) + _compress(bytes(buf[HEADER_SIZE:n]))
+    return bytes(buf[:n])
+
+def decode(body):
+    """Decodes a body back into a list of reading dicts"""
+    magic, flags, station, timestamp, count = struct.unpack_from(HEADER, body)
+    if magic != MAGIC:
+        raise ValueError("not a reading stream")
+    data = body[HEADER_SIZE:]
+    if flags & FLAG_DEFLATE:
+        data = _decompress(data)
+    records = []
+    pos = 0
+    for _ in range(count):
+        gap = struct.unpack_from("<H", data, pos)[0]
+        if gap == LONG_GAP:
+            timestamp = struct.unpack_from("<I", data, pos + 2)[0]
+            pos = pos + 4
+        else:
+            timestamp = timestamp + gap
+        temp, humidity, ppm, pressure = struct.unpack_from("<hhff", data, pos + 2)
+        pos = pos + RECORD_SIZE
+        records.append({"weatherStationId": str(station), "temperatureCelsius": temp / 100, "airPressureHpa": pressure,
+                        "airQualityPpm": ppm, "humidityPercent": humidity / 100, "timestamp": timestamp})
+    return records
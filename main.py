@@ -9,101 +9,132 @@
 #
 
 # Import core libraries
-import network, time, json, urequests, random, machine
+import network, time, json, random, machine, binascii, gc
 
-# Import DHT11 library
-import dht
+# Import tick helpers
+from ticks import ticks_ms, ticks_diff, sleep_ms
 
-# Import MQ135 library
-from mq135 import MQ135
+BOOT_START = ticks_ms()
 
-# Import BMP280 library
-from bmp280 import *
+# Import sensor drivers
+from drivers import load as load_drivers, Scheduler
+import i2cbus
+
+# Import windowed aggregation
+from aggregate import Aggregator
+
+# Import report-by-exception filter
+from report import Reporter
+
+# Import adaptive sampling
+from adaptive import Adaptive, Battery
+
+# Import upload queue
+from uploader import Uploader
+
+# Import binary reading log
+from ringlog import RingLog
+
+# Import backlog replay
+from replay import Replay
+
+# Import warm-start cache
+from bootcache import BootCache
+
+# Import Wi-Fi supervisor
+from wifi import WifiSupervisor
+
+# Import instrumentation
+from metrics import Metrics
 
 # Global variables
 MODE = "OFFLINE"
 URL = "https://ftw.pietr.dev/ws/weather/data"
 CONFIG_FILE = "/config.json"
+INTERVAL = 60 # Seconds between readings
+RECORD_KEYS = ("weatherStationId", "temperatureCelsius", "airPressureHpa", "airQualityPpm", "humidityPercent", "timestamp", "interval")
+SENSOR_KEYS = ("temp", "humidity", "quality", "pressure") # Values of the built in sensors, the record names them above
 sta_if = network.WLAN(network.WLAN.IF_STA)
 START_MSG = """
 Fetch The Weather: Weather stations
 Copyright (c) 2025 Fetch The Weather
 """
 
-# SENSORS
-DHT11_ENABLED = True
-MQ135_ENABLED = True
-BMP280_ENABLED = True
-
 # Define classes
 class Data:
-    def __init__(self, sensors, config):
+    def __init__(self, sensors, config, aggregator=None):
         self.sensors = sensors
         self.config = config
+        self.aggregator = aggregator # Summarizes the sensor reads of each reporting window when set
+        self.stats = None
+        self.history = None # RingLog keeping every reading for time range queries when set
         self.time = None
+        self.interval = INTERVAL # Seconds since the reading before, as planned by the sampling interval
         self.temp = None
         self.humidity = None
         self.quality = None
         self.pressure = None
+        self.extra = {} # Values of other sensors, such as drivers loaded from a "module", by name
+        self.first_reading_ms = None # Time from boot to the first reading
+        self.station_id = str(config.config["id"])
+        self.record = {} # Filled in by get_dict() on every reading
     
     def collect(self):
-        dht11_data = self.sensors.dht11()
+        values = self.sensors.poll() # Latest value of every sensor, slow sensors are only read when due
         self.time = time.time()
-        self.temp = dht11_data["temp"]
-        self.humidity = dht11_data["humidity"]
-        self.quality = sensors.mq135(self.temp, self.humidity)
-        self.pressure = self.sensors.bmp280()
+        if self.aggregator != None:
+            self.stats = self.aggregator.summary()
+        self.temp = self.value(values, "temp")
+        self.humidity = self.value(values, "humidity")
+        self.quality = self.value(values, "quality")
+        self.pressure = self.value(values, "pressure")
+        self.extra.clear()
+        for name in values:
+            if name not in SENSOR_KEYS:
+                self.extra[name] = self.value(values, name)
+        if self.history != None:
+            self.history.append(self.time, self.temp or 0, self.humidity or 0, self.quality or 0, self.pressure or 0)
+        if self.first_reading_ms == None:
+            self.first_reading_ms = ticks_diff(ticks_ms(), BOOT_START)
+            print("INFO: First reading " + str(self.first_reading_ms) + " ms after boot")
+
+    def value(self, values, name):
+        # Window mean when aggregating, otherwise the latest value
+        if self.stats != None and name in self.stats:
+            return self.stats[name][3]
+        return values.get(name)
 
     def get_dict(self):
-        if self.temp == None:
-            temp = 0
-        else:
-            temp = self.temp
-        if self.humidity == None:
-            humidity = 0
-        else:
-            humidity = self.humidity
-        if self.quality == None:
-            quality = 0
-        else:
-            quality = self.quality
-        if self.pressure == None:
-            pressure = 0
-        else:
-            pressure = self.pressure
-        return {"weatherStationId": str(self.config.config["id"]), "temperatureCelsius": temp, "airPressureHpa": pressure, "airQualityPpm": quality, "humidityPercent": humidity, "timestamp": self.time}
-
-class Sensors:
-    def __init__(self, dht11, mq135, bmp280):
-        self.DHT11 = dht11
-        self.MQ135 = mq135
-        self.BMP280 = bmp280
-
-    def dht11(self):
-        if self.DHT11 == None:
-            return {"temp": None, "humidity": None}
-        self.DHT11.measure()
-        return {"temp": self.DHT11.temperature(), "humidity": self.DHT11.humidity()}
-
-    def mq135(self, temp, humidity):
-        if self.MQ135 == None:
-            return None
-        rzero = self.MQ135.get_rzero()
-        corrected_rzero = self.MQ135.get_corrected_rzero(temp, humidity)
-        resistance = self.MQ135.get_resistance()
-        ppm = self.MQ135.get_ppm()
-        corrected_ppm = self.MQ135.get_corrected_ppm(temp, humidity)
-        return corrected_ppm
-    
-    def bmp280(self):
-        if self.BMP280 == None:
-            return None
-        self.BMP280.normal_measure()
-        return self.BMP280.pressure
-    
+        """Returns the reading as a dict
+
+        The same dict is filled in on every call, copy it to keep it past
+        the next reading.
+        """
+        record = self.record
+        if len(record) > len(RECORD_KEYS): # Drops "stats", "health", "suppressed" and other sensors of the last reading
+            for key in [k for k in record if k not in RECORD_KEYS]:
+                del record[key]
+        record["weatherStationId"] = self.station_id
+        record["temperatureCelsius"] = self.temp or 0
+        record["airPressureHpa"] = self.pressure or 0
+        record["airQualityPpm"] = self.quality or 0
+        record["humidityPercent"] = self.humidity or 0
+        record["timestamp"] = self.time
+        record["interval"] = self.interval
+        for name in self.extra:
+            record[name] = self.extra[name]
+        if self.stats != None:
+            record["stats"] = self.stats # field: [count, min, max, mean, stddev]
+        return record
+
+    def from_record(self, record):
+        # Converts a logfile record back into the upload format
+        timestamp, temp, humidity, quality, pressure = record
+        return {"weatherStationId": str(self.config.config["id"]), "temperatureCelsius": temp, "airPressureHpa": pressure, "airQualityPpm": quality, "humidityPercent": humidity, "timestamp": timestamp}
+
 class Config:
     def __init__(self):
-        self.config = {"id": 0, "network": {"ssid": "", "psk": ""}, "logfile": "/log.txt"}
+        self.config = {"id": 0, "network": {"ssid": "", "psk": ""}, "logfile": "/log.bin", "logrecords": 4096, "upload": {"batch_size": 1, "batch_age": 300, "format": "json", "transport": "http", "mqtt": {"url": "mqtts://ftw.pietr.dev:8883", "topic": "ftw/weather", "keepalive": 60, "max_inflight": 8}}, "replay": {"chunk": 20, "interval": 60}, "runtime": "loop", "sensors": [{"driver": "dht11", "pin": 4, "interval": 60}, {"driver": "mq135", "pin": 26, "interval": 60, "samples": 9, "sample_us": 200, "trim": 2}, {"driver": "bmp280", "sda": 8, "scl": 9, "addr": 118, "interval": 60}], "aggregate": {"enabled": False, "sample_interval": 2}, "report": {"enabled": False, "heartbeat": 900, "predict": "hold", "deadband": {"temperatureCelsius": {"abs": 0.5}, "humidityPercent": {"abs": 2}, "airQualityPpm": {"rel": 0.1}, "airPressureHpa": {"abs": 30}}}, "history": {"enabled": False, "path": "/history.bin", "records": 8192}, "adaptive": {"enabled": False, "min_interval": 15, "max_interval": 600, "grow": 1.5, "change": {"temperatureCelsius": {"abs": 1}, "humidityPercent": {"abs": 3}, "airQualityPpm": {"rel": 0.1}, "airPressureHpa": {"abs": 30}}, "sleep": "none", "battery": {"pin": None, "divider": 2, "low_volts": 3.5, "low_interval": 300}}, "warm_start": True, "bootcache": "/boot.json", "metrics": {"enabled": False, "health_every": 60}}
         
     def load(self):
         f = open(CONFIG_FILE)
@@ -113,6 +144,10 @@ class Config:
             print("ERROR: Invalid configuration file")
             print("INFO: Sticking with default configuration")
         else:
+            # Fill in settings missing from older configuration files
+            for key in self.config:
+                if key not in conf:
+                    conf[key] = self.config[key]
             self.config = conf
             # Check if ID != 0
             if self.config["id"] == 0:
@@ -134,33 +169,62 @@ class Config:
         return True
         
 
-def connect(config):
+def remember_network():
+    # Saves the channel and BSSID of the current connection for the next warm start
+    try:
+        info = {"channel": sta_if.config("channel"), "bssid": binascii.hexlify(sta_if.config("bssid")).decode()}
+    except:
+        return # Not available on this port
+    bootcache.update("wifi", info)
+
+def link_up():
+    print(f"INFO: Connected to network {config.config['network']['ssid']} after {wifi.last_connect_ms} ms")
+    remember_network()
+
+def save_queued(uploader, log):
+    # Readings waiting for upload go to the logfile to be replayed later
+    for record in uploader.queue:
+        log(record)
+    uploader.queue = []
+
+def link_down(uploader, log):
+    print("WARNING: Lost network connection, running in offline mode")
+    save_queued(uploader, log)
+
+def upload(record, uploader, replay, log, send=False, now=None):
+    # Queues a reading online and sends the queue when due, or always with send, then a chunk of the backlog
+    for overflow in uploader.add(record, now): # Upload queue is full, oldest readings go to the logfile
+        log(overflow)
+    if uploader.due(now) or send:
+        if uploader.flush() == False:
+            print("WARNING: An error occured when sending request. Keeping readings queued...")
+    if uploader.failures == 0: # Live readings first, then the backlog
+        replay.step(now)
+
+def check_link():
+    # Advances the Wi-Fi supervisor without blocking, returns True when online
     global MODE
-    if sta_if.active() == False:
-        sta_if.active(True)
-    sta_if.connect(config["network"]["ssid"], config["network"]["psk"]) # Connects to network
-    i = 0
-    connected = False
-    while i < 10: # Checks for a connection during a 10 second period
-        if sta_if.isconnected() == True:
-            connected = True
-            break
-        time.sleep(1)
-        i = i + 1
-    if connected == False:
-        print("ERROR: Failed to connect to network, running in offline mode")
-    else:
-        print(f"INFO: Connected to network {config['network']['ssid']}")
+    if wifi.poll() == True:
         MODE = "ONLINE"
+        return True
+    MODE = "OFFLINE"
+    return False
+
+def wait_link(timeout_ms):
+    # Gives the Wi-Fi supervisor up to timeout_ms to bring the link up, returns True when online
+    start = ticks_ms()
+    while check_link() == False:
+        if ticks_diff(ticks_ms(), start) >= timeout_ms:
+            return False
+        sleep_ms(100)
+    return True
 
 def get_time():
     return time.time()
 
-def log():
-    f = open(config.config["logfile"], "a")
-    f.write(str(data.get_dict()) + "\n")
-    f.close()
-    print("LOG: " + str(data.get_dict()))
+def log(record):
+    logfile.append(record["timestamp"], record["temperatureCelsius"], record["humidityPercent"], record["airQualityPpm"], record["airPressureHpa"])
+    print("LOG:", record)
         
 # Main program loop
 if __name__ == "__main__":
@@ -169,75 +233,160 @@ if __name__ == "__main__":
     config = Config()
     config.load()
     
-    DHT11_object = None
-    MQ135_object = None
-    BMP280_object = None
-    
-    # Sensor initialization goes here
+    bootcache = BootCache(config.config["bootcache"])
+    warm = None
+    if config.config["warm_start"] == True:
+        warm = bootcache.load()
+    if warm != None:
+        print("INFO: Warm start, using cached hardware probe")
     
-    # DHT11 sensor initialization
-    if DHT11_ENABLED == True:
-        try:
-            DHT11_object = dht.DHT11(machine.Pin(4))
-            try: DHT11_object.measure() # First time always fails to pull data due to a checksum error
-            except: DHT11_object.measure() # Second time should work if the sensor is available
-            print("INFO: Initialized DHT11 module")
-        except:
-            print("ERROR: Failed to initialize DHT11 module")
-            DHT11_object = None
+    def warm_start_failed(name):
+        # Only a cached sensor failing before its first good read means the hardware changed
+        if sensors.get(name).reads > 0:
+            return
+        print("ERROR: Cached " + name.upper() + " module failed, restarting with a full hardware probe")
+        save_queued(uploader, log)
+        bootcache.invalidate()
+        machine.reset()
+
+    # Sensors are set up from the "sensors" list in the configuration file
+    cached = None
+    if warm != None:
+        cached = warm["sensors"]
+    drivers, probe = load_drivers(config.config["sensors"], cached)
+    if warm != None:
+        sensors = Scheduler(drivers, on_failure=warm_start_failed)
     else:
-        print("INFO: DHT11 module is disabled")
-
-    # MQ135 module initialization
-    if MQ135_ENABLED == True:
-        try:
-            MQ135_object = MQ135(machine.Pin(26))
-            MQ135_object.get_rzero() # 'Read from module' check
-            print("INFO: Initialized MQ135 module")
-            if DHT11_object == None:
-                print("ERROR: Dependancy check failed for module MQ135: DHT11 module is not initialized")
-                MQ135_object = None
-        except:
-            print("ERROR: Failed to initialize MQ135 module")
-            MQ135_object = None
+        sensors = Scheduler(drivers)
+    aggregator = None
+    if config.config["aggregate"]["enabled"] == True:
+        # Every sensor read feeds the window statistics, each reading reports the window
+        aggregator = Aggregator(invalid={"quality": -1}) # The MQ135 reads -1 at either end of the ADC range
+        sensors.on_read = aggregator.add
+        for driver in sensors.drivers:
+            driver.interval = max(min(driver.interval, config.config["aggregate"]["sample_interval"]), driver.min_interval)
+        print("INFO: Aggregating readings over " + str(INTERVAL) + " s windows")
+    adaptive = None
+    sleep = "none"
+    if config.config["adaptive"]["enabled"] == True:
+        # The interval follows the rate of change of the readings
+        settings = config.config["adaptive"]
+        battery = None
+        if settings["battery"]["pin"] != None:
+            battery = Battery(settings["battery"]["pin"], divider=settings["battery"]["divider"], low_volts=settings["battery"]["low_volts"])
+        adaptive = Adaptive(settings["change"], min_interval=settings["min_interval"], max_interval=settings["max_interval"], interval=INTERVAL,
+                            grow=settings["grow"], low_interval=settings["battery"]["low_interval"], battery=battery)
+        sleep = settings["sleep"]
+        if sleep == "deep" and adaptive.restore():
+            print("INFO: Woke from deep sleep, next interval " + str(adaptive.interval) + " s")
+        if sleep == "deep" and aggregator != None:
+            # Nothing is read while the board is off, every window would hold a single read
+            print("WARNING: Aggregation does not work with deep sleep, disabled")
+            aggregator = None
+            sensors.on_read = None
+        for driver in sensors.drivers:
+            # Every reading reads every sensor, nothing is read between readings
+            driver.interval = max(min(driver.interval, adaptive.min_interval), driver.min_interval)
+        print("INFO: Adaptive sampling every " + str(adaptive.min_interval) + " to " + str(adaptive.max_interval) + " s")
+    data = Data(sensors, config, aggregator)
+    if adaptive != None:
+        data.interval = adaptive.interval
+    if config.config["history"]["enabled"] == True:
+        # Every reading is kept, the oldest are overwritten once the file is full
+        data.history = RingLog(config.config["history"]["path"], config.config["history"]["records"])
+        data.history.open()
+    logfile = RingLog(config.config["logfile"], config.config["logrecords"])
+    logfile.open()
+    upload = config.config["upload"]
+    transport = upload.get("transport", "http")
+    if transport == "mqtt":
+        # One persistent broker connection, readings are published with QoS 1
+        from mqtt import MQTTUploader # Imported only when used, saves its heap on HTTP stations
+        mqtt = upload["mqtt"]
+        uploader = MQTTUploader(mqtt["url"], config.config["id"], topic=mqtt.get("topic", "ftw/weather"), keepalive=mqtt.get("keepalive", 60),
+                                max_inflight=mqtt.get("max_inflight", 8), user=mqtt.get("user"), password=mqtt.get("password"),
+                                batch_size=upload["batch_size"], batch_age=upload["batch_age"], fmt=upload.get("format", "json"))
+        print("INFO: Publishing readings to " + mqtt["url"])
     else:
-        print("INFO: MQ135 module is disabled")
-
-    # BMP280 sensor initialization
-    if BMP280_ENABLED == True:
-        bus = machine.I2C(sda=machine.Pin(8), scl=machine.Pin(9))
-        addr = 0x76
-        if addr in bus.scan():
-            print("INFO: bmp280 module found at I2C address " + hex(addr))
-            try:
-                BMP280_object = BMP280(bus)
-
-                BMP280_object.use_case(BMP280_CASE_WEATHER)
-                BMP280_object.oversample(BMP280_OS_HIGH)
-                BMP280_object.normal_measure()
-                print("INFO: Initialized BMP280 module")
-            except:
-                print("ERROR: Failed to initialize BMP280 module")
-                BMP280_object = None
+        uploader = Uploader(URL, batch_size=upload["batch_size"], batch_age=upload["batch_age"], fmt=upload.get("format", "json"))
+    replay = Replay(logfile, uploader, data.from_record, chunk=config.config["replay"]["chunk"], interval=config.config["replay"]["interval"])
+    if config.config["metrics"]["enabled"] == True:
+        # Timed wrappers replace the measured methods, nothing is wrapped when disabled
+        metrics = Metrics()
+        for driver in sensors.drivers:
+            metrics.instrument(driver, "read", driver.name)
+        for bus in i2cbus.BUSES.values():
+            bus.on_cycle = lambda us: metrics.add("i2c", us) # Bus time of each read cycle
+        metrics.instrument(data, "collect")
+        metrics.instrument(uploader, "flush", "upload")
+        metrics.instrument_status(uploader, "post", transport)
+        log = metrics.timed("log", log)
+        metrics.attach(data, config.config["metrics"]["health_every"])
+    if config.config["warm_start"] == True:
+        # Save the probe results for the next warm start, link_up() adds the network
+        if warm == None:
+            bootcache.save({"sensors": probe})
         else:
-            print("ERROR: BMP280 module not found!")
-    else:
-        print("INFO: BMP280 module is disabled")
-    
-    sensors = Sensors(dht11=DHT11_object, mq135=MQ135_object, bmp280=BMP280_object) # Add sensor objects here
-    data = Data(sensors, config)
-    connect(config.config)
+            bootcache.update("sensors", probe) # A cached sensor that moved was probed again
+    report = None
+    if config.config["report"]["enabled"] == True:
+        # Readings inside the deadband are neither sent nor logged
+        reporter = Reporter(config.config["report"]["deadband"], heartbeat=config.config["report"]["heartbeat"], predict=config.config["report"]["predict"])
+        report = reporter.check
+        if adaptive != None and adaptive.extra != None and "report" in adaptive.extra:
+            reporter.restore(adaptive.extra["report"]) # The readings sent before the deep sleep
+    bssid = None
+    channel = None
+    if warm != None and bootcache.data != None and "wifi" in bootcache.data:
+        bssid = binascii.unhexlify(bootcache.data["wifi"]["bssid"])
+        channel = bootcache.data["wifi"]["channel"]
+    wifi = WifiSupervisor(sta_if, config.config["network"]["ssid"], config.config["network"]["psk"], bssid=bssid, channel=channel, on_up=link_up, on_down=lambda: link_down(uploader, log))
+    if config.config["metrics"]["enabled"] == True:
+        metrics.watch("wifi", wifi.stats) # Connect attempts, losses and connect times
+    check_link() # Starts connecting in the background
     print("INFO: Initialized system")
+    if config.config["runtime"] == "async":
+        print("INFO: Running asyncio runtime")
+        from runtime import Runtime # Imported only when used, uasyncio is large for the heap
+        runtime = Runtime(data, uploader, replay, log, check_link, period=INTERVAL, report=report, adaptive=adaptive)
+        runtime.run()
     print("INFO: Running main loop")
+    interval = data.interval
+    link_wait_ms = 0
+    if sleep == "deep":
+        link_wait_ms = wifi.connect_timeout_ms # Every wake is a fresh boot, the link is still coming up
     while True: # Infinite loop
+        data.interval = interval
         data.collect()
-        if MODE == "ONLINE":
-            response = urequests.request("POST", URL, json=data.get_dict())
-            if response.status_code == 200:
-                print("INFO: 200 from " + URL + ": " + response.text)
+        if sensors.on_failure != None and all(driver.reads > 0 for driver in sensors.drivers):
+            sensors.on_failure = None # The cached probe is confirmed, later errors are ordinary sensor errors
+        record = data.get_dict()
+        if report != None and report(record) == False:
+            pass # Counted in the next reading sent
+        elif wait_link(link_wait_ms) == True: # Catches a lost link before uploading
+            upload(record, uploader, replay, log, send=sleep == "deep") # The queue does not survive deep sleep
+        else:
+            log(record)
+        if adaptive != None:
+            interval = adaptive.update(record)
+        gc.collect() # Here rather than at a random point of the next cycle, such as during the DHT11 read
+        if sleep == "deep" and hasattr(machine, "deepsleep"):
+            # The board boots again after the interval, readings not acknowledged are replayed from the logfile
+            save_queued(uploader, log)
+            for unacked in uploader.unacknowledged():
+                log(unacked)
+            if report != None:
+                adaptive.save({"report": reporter.state()})
             else:
-                print("WARNING: An error occured when sending request. Falling back to logfile...")
-                log()
+                adaptive.save()
+            machine.deepsleep(interval * 1000)
+        elif sleep == "light" and hasattr(machine, "lightsleep"):
+            machine.lightsleep(interval * 1000) # The Wi-Fi supervisor reconnects if the link dropped
+            check_link()
         else:
-            log()
-        time.sleep(60)
\ No newline at end of file
+            for i in range(interval): # Keeps the Wi-Fi supervisor going while waiting
+                time.sleep(1)
+                if check_link() == True:
+                    uploader.poll() # Keepalive and resend of unacknowledged messages
+                if adaptive == None or aggregator != None:
+                    sensors.poll() # Sensors with a shorter interval keep their own pace
@@ -0,0 +1,26 @@
+#
+# Fetch The Weather: Weather stations
+# Host-side hardware simulation
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# The modules in sim/modules stand in for the MicroPython hardware modules
+# (machine, network, dht, ...) so the station code in lib/ and main.py can
+# run on a host, under CPython or the MicroPython unix port.
+# Call install() before importing anything from lib/ or main.
+
+import sys
+
+def _root():
+    path = __file__.replace("\\", "/")
+    return path[:path.rfind("/sim/")] if "/sim/" in path else "."
+
+def install():
+    root = _root()
+    for path in (root, root + "/lib", root + "/sim/modules"):
+        if path not in sys.path:
+            sys.path.insert(0, path)
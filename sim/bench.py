@@ -0,0 +1,89 @@
+#
+# Fetch The Weather: Weather stations
+# Station benchmark suite
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Runs the station code on the simulated hardware and reports per stage
+# latency, heap use and, for the upload loop, bytes on the wire. Run from
+# the repository root under CPython or the MicroPython unix port:
+#   python -m sim.bench
+#   micropython -m sim.bench
+
+import sim
+sim.install()
+
+from ticks import ticks_us, ticks_diff
+from sim import heap, station
+from sim.ingest import IngestServer
+from uploader import Uploader
+
+ITERATIONS = 200
+
+def timed(fn, iterations=ITERATIONS):
+    """Returns mean and max latency of fn in us"""
+    total = 0
+    worst = 0
+    for _ in range(iterations):
+        start = ticks_us()
+        fn()
+        elapsed = ticks_diff(ticks_us(), start)
+        total = total + elapsed
+        if elapsed > worst:
+            worst = elapsed
+    return total / iterations, worst
+
+def report(name, fn, extra=""):
+    mean, worst = timed(fn)
+    print("%-24s %9.1f us mean %9d us max %8d %s  %s" % (name, mean, worst, heap.allocated(fn), heap.UNIT, extra))
+    return mean
+
+def bench_collect(data):
+    return report("Data.collect()", data.collect)
+
+def bench_bmp280(bmp):
+    bmp.load_test_calibration()
+    bmp.load_test_data()
+    def compensate():
+        bmp._t_fine = 0
+        bmp._t = 0
+        bmp._p = 0
+        bmp._compensate_t_fine()
+        bmp._compensate_t()
+        bmp._compensate_p()
+    return report("BMP280 compensation", compensate)
+
+def bench_mq135(mq135):
+    return report("MQ135 conversion", lambda: mq135.snapshot(21.0, 45.0))
+
+def bench_upload(data, batch_size):
+    server = IngestServer(port=0).start()
+    uploader = Uploader(server.url(), batch_size=batch_size, batch_age=3600, verbose=False)
+    def cycle():
+        data.collect()
+        uploader.add(data.get_dict())
+        if uploader.due():
+            uploader.flush()
+    mean = report("upload cycle, batch %d" % batch_size, cycle)
+    uploader.flush()
+    server.stop()
+    per_reading = (server.bytes_in + server.bytes_out) / max(1, server.readings)
+    print("%-24s %d requests %d connections %.1f B/reading on the wire" % (
+        "", server.requests, server.connections, per_reading))
+    return mean
+
+def main():
+    sensors = station.make_sensors()
+    data = station.make_data(sensors=sensors)
+    bench_collect(data)
+    bench_bmp280(sensors.get("bmp280").sensor)
+    bench_mq135(sensors.get("mq135").sensor)
+    bench_upload(data, 1)
+    bench_upload(data, 10)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#
+# Fetch The Weather: Weather stations
+# Adaptive sampling benchmark
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Replays two simulated days at 10 s resolution, with a day/night cycle, a
+# pressure front and pollution spikes, through fixed sampling intervals and
+# the adaptive interval. The server side is rebuilt by linear interpolation
+# between the readings taken and compared with the true signal, reporting
+# readings taken, RMS and max error per field and the share of each
+# pollution spike's peak that was caught. Run from the repository root:
+#   python -m sim.bench_adaptive
+
+import sim
+sim.install()
+
+import math, random
+from sim import station
+from adaptive import Adaptive
+
+FIELDS = ("temperatureCelsius", "humidityPercent", "airQualityPpm", "airPressureHpa")
+DAY = 86400
+STEP = 10
+FRONT = 30 * 3600 # A pressure front passes 30 h into the trace
+
+def simulated(days=2, seed=1):
+    """Returns the true signal and what the sensors read, one entry per STEP seconds"""
+    rnd = random.Random(seed)
+    truth = []
+    measured = []
+    ppm_event = 0.0
+    decay = 0.9 ** (STEP / 60) # A spike fades by 10 % a minute
+    for i in range(days * DAY // STEP):
+        t = i * STEP
+        phase = 2 * math.pi * (t % DAY) / DAY
+        temp = 12 + 6 * math.sin(phase - 2.4)
+        humidity = 70 - 20 * math.sin(phase - 2.4)
+        front = (t - FRONT) / 900
+        pressure = 101300 + 250 * math.sin(2 * math.pi * t / (3 * DAY)) - 600 * (1 + math.tanh(front)) # 12 hPa drop in about half an hour
+        temp = temp - 2 * (1 + math.tanh(front))
+        if rnd.random() < 0.005 * STEP / 60: # Traffic, a fire nearby
+            ppm_event = ppm_event + rnd.uniform(100, 400)
+        ppm_event = ppm_event * decay
+        ppm = 420 + ppm_event
+        truth.append((temp, humidity, ppm, pressure))
+        measured.append({"weatherStationId": "1", "temperatureCelsius": round(temp + rnd.gauss(0, 0.3)),
+                         "humidityPercent": round(humidity + rnd.gauss(0, 1)), "airQualityPpm": ppm + rnd.gauss(0, 6),
+                         "airPressureHpa": pressure + rnd.gauss(0, 4), "timestamp": 1700000000 + t})
+    return truth, measured
+
+def spikes(truth):
+    """Returns (first, last) index ranges where the air quality is more than 50 ppm up"""
+    ranges = []
+    start = None
+    for i in range(len(truth)):
+        if truth[i][2] > 470 and start == None:
+            start = i
+        elif truth[i][2] <= 470 and start != None:
+            ranges.append((start, i))
+            start = None
+    return ranges
+
+def sample(measured, interval):
+    """Returns the indexes of the readings taken, interval is a number or an Adaptive"""
+    taken = []
+    i = 0
+    while i < len(measured):
+        taken.append(i)
+        if type(interval) is int:
+            seconds = interval
+        else:
+            seconds = interval.update(measured[i])
+        i = i + max(1, seconds // STEP)
+    return taken
+
+def evaluate(truth, measured, taken, ranges):
+    squares = [0.0] * len(FIELDS)
+    worst = [0.0] * len(FIELDS)
+    count = 0
+    for a, b in zip(taken, taken[1:] + [None]):
+        end = b if b != None else len(truth)
+        for i in range(a, end):
+            for f in range(len(FIELDS)):
+                if b == None:
+                    value = measured[a][FIELDS[f]]
+                else:
+                    value = measured[a][FIELDS[f]] + (measured[b][FIELDS[f]] - measured[a][FIELDS[f]]) * (i - a) / (b - a)
+                error = abs(value - truth[i][f])
+                squares[f] = squares[f] + error * error
+                if error > worst[f]:
+                    worst[f] = error
+            count = count + 1
+    rms = [math.sqrt(s / count) for s in squares]
+    taken_set = set(taken)
+    caught = 0.0
+    for first, last in ranges:
+        peak = max(truth[i][2] for i in range(first, last)) - 420
+        seen = max([measured[i]["airQualityPpm"] - 420 for i in range(first, last) if i in taken_set] + [0])
+        caught = caught + min(1.0, seen / peak)
+    return rms, worst, caught / max(1, len(ranges))
+
+class LowBattery:
+    def low(self, was_low=False):
+        return True
+
+def scaled(change, scale):
+    bands = {}
+    for field in change:
+        bands[field] = {}
+        for kind in change[field]:
+            bands[field][kind] = change[field][kind] * scale
+    return bands
+
+def main():
+    truth, measured = simulated()
+    ranges = spikes(truth)
+    settings = station.make_config().config["adaptive"]
+    def adaptive(scale=1, battery=None):
+        return Adaptive(scaled(settings["change"], scale), min_interval=settings["min_interval"], max_interval=settings["max_interval"],
+                        grow=settings["grow"], low_interval=settings["battery"]["low_interval"], battery=battery)
+    runs = [("fixed 15 s", 15), ("fixed 60 s", 60), ("fixed 300 s", 300), ("fixed 600 s", 600),
+            ("adaptive, change x0.5", adaptive(0.5)), ("adaptive", adaptive()), ("adaptive, change x2", adaptive(2)),
+            ("adaptive, low battery", adaptive(battery=LowBattery()))]
+    print("Trace: 2 simulated days at %d s, pressure front at %d h, %d pollution spikes" % (STEP, FRONT // 3600, len(ranges)))
+    print("%-22s %7s %8s   %-13s %-13s %-15s %-15s %7s" % ("sampling", "taken", "vs 60 s", "temp rms/max", "hum rms/max", "ppm rms/max", "pres rms/max", "peaks"))
+    baseline = len(sample(measured, 60))
+    for name, interval in runs:
+        taken = sample(measured, interval)
+        rms, worst, caught = evaluate(truth, measured, taken, ranges)
+        errors = ["%5.2f/%-7.2f" % (rms[i], worst[i]) for i in range(2)] + ["%6.2f/%-8.2f" % (rms[i], worst[i]) for i in range(2, 4)]
+        print("%-22s %7d %7.0f%%   %s %6.0f%%" % (name, len(taken), 100.0 * len(taken) / baseline - 100, " ".join(errors), caught * 100))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#
+# Fetch The Weather: Weather stations
+# Windowed aggregation benchmark
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Runs the simulated station with aggregation the way main.py sets it up,
+# several sensor reads per reporting window, with ADC glitches that make
+# the MQ135 report its invalid -1 reading. Checks the stats of every window
+# against a direct calculation over the valid reads of that window, then
+# times a window of reads with and without the aggregator. Run from the
+# repository root:
+#   python -m sim.bench_aggregate
+
+import sim
+sim.install()
+
+import math, random
+import machine
+from main import Data
+from ticks import ticks_us, ticks_diff
+from sim import station
+from aggregate import Aggregator
+
+WINDOWS = 50
+READS = 12 # Sensor reads per window
+INVALID = {"quality": -1}
+FIELDS = ("temp", "humidity", "quality", "pressure")
+
+def direct(values):
+    """Returns [count, min, max, mean, stddev] of a list of values, two passes"""
+    count = len(values)
+    mean = sum(values) / count
+    stddev = 0.0
+    if count > 1:
+        stddev = math.sqrt(sum((x - mean) * (x - mean) for x in values) / (count - 1))
+    return [count, min(values), max(values), mean, stddev]
+
+def make(aggregate=True):
+    sensors = station.make_sensors(samples=1, trim=0) # Single samples let the ADC glitches through
+    aggregator = None
+    seen = {}
+    if aggregate:
+        aggregator = Aggregator(invalid=INVALID)
+        def on_read(values):
+            for name in values:
+                seen.setdefault(name, []).append(values[name])
+            aggregator.add(values)
+        sensors.on_read = on_read
+    return Data(sensors, station.make_config(), aggregator), seen
+
+def check():
+    data, seen = make()
+    invalid = 0
+    for window in range(WINDOWS):
+        seen.clear()
+        for _ in range(READS - 1):
+            data.sensors.poll()
+        data.collect() # Reads once more, then summarizes the window
+        stats = data.get_dict()["stats"]
+        for name in FIELDS:
+            values = [x for x in seen[name] if x != INVALID.get(name)]
+            invalid = invalid + len(seen[name]) - len(values)
+            if len(values) == 0:
+                assert name not in stats, (window, name, stats)
+                continue
+            expected = direct(values)
+            assert stats[name][0] == expected[0], (window, name, stats[name], expected)
+            for i in range(1, 5):
+                assert abs(stats[name][i] - expected[i]) <= 0.005 + 1e-9 * abs(expected[i]), (window, name, stats[name], expected)
+    assert invalid > 0, "no invalid MQ135 reading, raise the ADC glitch rate"
+    print("%d windows of %d reads, %d invalid reads left out, stats match the direct calculation" % (WINDOWS, READS, invalid))
+
+def cost(label, data):
+    start = ticks_us()
+    for _ in range(READS - 1):
+        data.sensors.poll()
+    data.collect()
+    data.get_dict()
+    print("%-22s %9.1f us/window" % (label, ticks_diff(ticks_us(), start)))
+
+def main():
+    random.seed(1)
+    machine.ADC.spikes = 0.1
+    check()
+    cost("without aggregation", make(False)[0])
+    cost("with aggregation", make()[0])
+
+if __name__ == "__main__":
+    main()
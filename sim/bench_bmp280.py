@@ -0,0 +1,59 @@
+#
+# Fetch The Weather: Weather stations
+# BMP280 bus usage benchmark
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Counts I2C transactions and bytes of the BMP280 driver on the simulated bus
+# against the expected counts and times the read paths. Exits with status 1
+# when a count differs. Run from the repository root:
+# python -m sim.bench_bmp280
+
+import sim
+sim.install()
+
+import sys, machine
+from ticks import ticks_us, ticks_diff
+from bmp280 import *
+
+READINGS = 1000
+
+def count(label, bus, fn, expected):
+    """Runs fn, prints its bus use and returns True when it took expected transactions"""
+    transactions, nbytes = bus.transactions, bus.bytes
+    result = fn()
+    transactions = bus.transactions - transactions
+    print("%-28s %3d transactions %4d bytes  -> %s" % (label, transactions, bus.bytes - nbytes, result))
+    if transactions != expected:
+        print("ERROR: %s took %d transactions, expected %d" % (label, transactions, expected))
+        return False
+    return True
+
+def timed(label, fn):
+    start = ticks_us()
+    for _ in range(READINGS):
+        fn()
+    print("%-28s %9.1f us/reading" % (label, ticks_diff(ticks_us(), start) / READINGS))
+
+def main():
+    bus = machine.I2C(sda=machine.Pin(8), scl=machine.Pin(9))
+    sensors = []
+    ok = count("init (calibration, use case)", bus, lambda: sensors.append(BMP280(bus, use_case=BMP280_CASE_WEATHER)), 3)
+    bmp = sensors[0]
+    ok = count("temperature + pressure", bus, lambda: (bmp.temperature, bmp.pressure), 1) and ok # One burst read
+    ok = count("read() within 200 ms", bus, bmp.read, 0) and ok # Served from the cache
+    ok = count("measure() (forced mode)", bus, bmp.measure, 4) and ok
+    bmp._new_read_ms = 0 # Time the bus path, not the cache
+    timed("temperature + pressure", lambda: (bmp.temperature, bmp.pressure))
+    timed("read()", bmp.read)
+    bmp._new_read_ms = 200
+    timed("read() cached", bmp.read)
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
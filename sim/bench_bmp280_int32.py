@@ -0,0 +1,135 @@
+#
+# Fetch The Weather: Weather stations
+# BMP280 32-bit compensation benchmark
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Checks the 32-bit integer pressure compensation against the 64-bit path
+# on the datasheet example and on a sweep of raw temperature and pressure
+# values, which must stay within MAX_MEAN_ERROR and MAX_ERROR, checks that
+# the viper build and the pure Python copy agree and that the latter
+# never leaves MicroPython's small ints, then times both paths
+# and reports their heap use. On a host the viper build runs as plain
+# Python, run it on the MicroPython unix port or a board for the machine
+# code timings. Run from the repository root:
+#   python -m sim.bench_bmp280_int32
+
+import sim
+sim.install()
+
+import sys, machine
+from array import array
+from ticks import ticks_us, ticks_diff
+from sim import heap
+import bmp280
+from bmp280 import BMP280
+from bmp280_viper import compensate_p32 as viper_p32
+
+ROUNDS = 1000
+SMALL_INT = 1 << 30 # MicroPython boxes ints outside -2**30 .. 2**30 - 1 on 32-bit ports
+MAX_MEAN_ERROR = 2.0 # Pa, the int32 path against the 64-bit one over the sweep
+MAX_ERROR = 6.0
+
+def sensor(int32):
+    bmp = BMP280(machine.I2C(), use_case=None, int32=int32)
+    bmp.load_test_calibration()
+    bmp.load_test_data()
+    return bmp
+
+def pressure(bmp, t_raw, p_raw):
+    bmp._t_raw = t_raw
+    bmp._p_raw = p_raw
+    bmp._t_fine = 0
+    bmp._p = 0
+    bmp._compensate_t_fine()
+    return bmp._compensate_p()
+
+def sweep():
+    # Raw values of about -20 to 45 C and 300 to 1100 hPa
+    for t_raw in range(440000, 560001, 10000):
+        for p_raw in range(230000, 690001, 5000):
+            yield t_raw, p_raw
+
+def accuracy():
+    wide = sensor(False)
+    narrow = sensor(True)
+    cal = array('i', narrow.calibration())
+    print("datasheet example  int64 %.2f Pa  int32 %d Pa" % (pressure(wide, 519888, 415148), pressure(narrow, 519888, 415148)))
+    worst = 0
+    total = 0
+    count = 0
+    for t_raw, p_raw in sweep():
+        reference = pressure(wide, t_raw, p_raw)
+        value = pressure(narrow, t_raw, p_raw)
+        assert value == viper_p32(narrow._t_fine, p_raw, cal), (t_raw, p_raw)
+        assert value == bmp280._compensate_p32(narrow._t_fine, p_raw, cal), (t_raw, p_raw)
+        error = abs(value - reference)
+        total = total + error
+        count = count + 1
+        if error > worst:
+            worst = error
+    print("sweep of %d raw pairs  mean error %.2f Pa  max error %.2f Pa  viper and Python agree" % (count, total / count, worst))
+    assert total / count <= MAX_MEAN_ERROR and worst <= MAX_ERROR, (total / count, worst)
+    # A zero P1 makes var1 zero, both paths return 0 instead of dividing by it
+    for bmp in (wide, narrow):
+        bmp._P1 = 0
+        bmp._cal32 = None
+        assert pressure(bmp, 519888, 415148) == 0
+
+class Small(int):
+    """An int that fails on any result MicroPython could not keep as a small int"""
+    pass
+
+def _checked(name):
+    def op(self, other):
+        result = getattr(int, name)(self, other)
+        if result is NotImplemented:
+            return result
+        assert -SMALL_INT <= result < SMALL_INT, (name, int(self), int(other), result)
+        return Small(result)
+    return op
+
+for _name in ("__add__", "__radd__", "__sub__", "__rsub__", "__mul__", "__rmul__", "__floordiv__", "__rfloordiv__",
+              "__lshift__", "__rlshift__", "__rshift__", "__rrshift__", "__and__", "__rand__"):
+    setattr(Small, _name, _checked(_name))
+
+def small_ints():
+    # Every intermediate value of the pure Python copy must stay a small int. Needs
+    # CPython, on MicroPython the heap use of the Python copy below shows it
+    if sys.implementation.name != "cpython":
+        return
+    cal = [Small(c) for c in sensor(True).calibration()]
+    count = 0
+    for t_raw, p_raw in sweep():
+        bmp = sensor(True)
+        bmp._t_raw = t_raw
+        bmp._compensate_t_fine()
+        bmp280._compensate_p32(Small(bmp._t_fine), Small(p_raw), cal)
+        count = count + 1
+    print("sweep of %d raw pairs  Python copy stays within MicroPython small ints" % count)
+
+def speed(label, fn):
+    start = ticks_us()
+    for _ in range(ROUNDS):
+        fn()
+    elapsed = ticks_diff(ticks_us(), start) / ROUNDS
+    print("%-22s %8.2f us/reading %8d %s" % (label, elapsed, heap.allocated(fn, 100), heap.UNIT))
+
+def main():
+    accuracy()
+    small_ints()
+    wide = sensor(False)
+    narrow = sensor(True)
+    cal = array('i', narrow.calibration())
+    t_fine = narrow._t_fine = 128422
+    speed("int64", lambda: pressure(wide, 519888, 415148))
+    speed("int32 " + bmp280.compensate_p32.__module__, lambda: pressure(narrow, 519888, 415148))
+    speed("int32 formula, Python", lambda: bmp280._compensate_p32(t_fine, 415148, cal))
+    speed("int32 formula, viper", lambda: viper_p32(t_fine, 415148, cal))
+
+if __name__ == "__main__":
+    main()
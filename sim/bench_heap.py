@@ -0,0 +1,89 @@
+#
+# Fetch The Weather: Weather stations
+# Steady-state heap benchmark
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Measures the heap use of each stage of a reading cycle once the station
+# has settled: sensor reads, the reading record, queueing and serializing
+# the upload body, next to the way each stage used to allocate a fresh
+# dict or body. Requests go to a stand-in session that only accepts the
+# body, so the HTTP stack and the ingest stub do not show up in the
+# numbers. Under the MicroPython unix port the numbers are bytes allocated
+# per cycle, under CPython the peak above the starting heap. Run from the
+# repository root:
+#   python -m sim.bench_heap
+#   micropython -m sim.bench_heap
+
+import sim
+sim.install()
+
+import json
+from sim import heap, station
+from uploader import Uploader
+import wire
+
+CYCLES = 50
+
+class NullSession:
+    """Accepts every request without sending it"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def post(self, body, content_type="application/json"):
+        self.bytes = self.bytes + len(body)
+        return 200, ""
+
+def uploader(fmt, batch_size):
+    u = Uploader("http://127.0.0.1/", batch_size=batch_size, batch_age=3600, verbose=False, fmt=fmt)
+    u.session = NullSession()
+    return u
+
+def row(name, before, after):
+    if before == None:
+        print("%-30s %12s %12d %s" % (name, "-", heap.allocated(after, CYCLES), heap.UNIT))
+    else:
+        print("%-30s %12d %12d %s" % (name, heap.allocated(before, CYCLES), heap.allocated(after, CYCLES), heap.UNIT))
+
+def main():
+    sensors = station.make_sensors()
+    data = station.make_data(sensors=sensors)
+    data.collect()
+    record = data.get_dict()
+    print("%-30s %12s %12s" % ("stage", "before", "after"))
+    row("sensor reads", None, sensors.poll)
+    row("reading record", lambda: dict(data.get_dict()), data.get_dict)
+    for fmt in ("json", "binary"):
+        for batch_size in (1, 10):
+            old = uploader(fmt, batch_size)
+            new = uploader(fmt, batch_size)
+            queue = []
+            def before():
+                # A fresh record per reading, a fresh body per request
+                queue.append(dict(data.get_dict()))
+                if len(queue) >= batch_size:
+                    body = queue[0] if batch_size == 1 else queue[:batch_size]
+                    if fmt == "json":
+                        old.session.post(json.dumps(body).encode())
+                    else:
+                        old.session.post(wire.encode(queue[:batch_size]))
+                    del queue[:batch_size]
+            def after():
+                new.add(data.get_dict())
+                if new.due():
+                    new.flush()
+            row("upload %s, batch %d" % (fmt, batch_size), before, after)
+    def cycle():
+        data.collect()
+        new.add(data.get_dict())
+        if new.due():
+            new.flush()
+    row("full cycle, binary batch 10", None, cycle)
+
+if __name__ == "__main__":
+    main()
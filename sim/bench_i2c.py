@@ -0,0 +1,76 @@
+#
+# Fetch The Weather: Weather stations
+# Shared I2C bus benchmark
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Reads one, two and three BMP280s on one simulated bus through the bmp280
+# driver and reports transactions, bytes and time per read cycle against
+# one measure() after the other. Then checks redundancy: a chip reading
+# off is voted out and a failed chip is skipped until its retry time
+# instead of costing a transaction every
+# cycle. Run from the repository root:
+#   python -m sim.bench_i2c
+
+import sim
+sim.install()
+
+import machine
+from ticks import ticks_us, ticks_diff
+import i2cbus
+from drivers import load
+
+CYCLES = 100
+
+def setup(addrs, p_raw=None):
+    machine.I2C.default_devices = {}
+    for addr in addrs:
+        machine.I2C.default_devices[addr] = machine.BMP280Device
+    i2cbus.BUSES.clear()
+    drivers, probe = load([{"driver": "bmp280", "sda": 8, "scl": 9, "addr": addrs}])
+    driver = drivers[0]
+    if p_raw != None:
+        for addr in p_raw:
+            driver.bus.i2c.devices[addr].p_raw = p_raw[addr]
+    return driver
+
+def cycles(label, driver):
+    i2c = driver.bus.i2c
+    transactions, nbytes = i2c.transactions, i2c.bytes
+    start = ticks_us()
+    bus_us = 0
+    for _ in range(CYCLES):
+        pressure = driver.read({})["pressure"]
+        bus_us = bus_us + driver.bus.last_cycle_us
+    elapsed = ticks_diff(ticks_us(), start)
+    print("%-32s %5.1f transactions %5.1f bytes %8.1f us bus %8.1f us/cycle  %.2f Pa" % (
+        label, (i2c.transactions - transactions) / CYCLES, (i2c.bytes - nbytes) / CYCLES,
+        bus_us / CYCLES, elapsed / CYCLES, pressure))
+
+def sequential(label, driver):
+    start = ticks_us()
+    for _ in range(CYCLES):
+        for sensor in driver.sensors:
+            sensor.measure()
+    print("%-32s %68.1f us/cycle" % (label, ticks_diff(ticks_us(), start) / CYCLES))
+
+def main():
+    print("%d read cycles each" % CYCLES)
+    cycles("1 chip", setup([0x76]))
+    driver = setup([0x76, 0x77])
+    cycles("2 chips, one wait", driver)
+    sequential("2 chips, measure() each", driver)
+    cycles("3 chips, one wait", setup([0x76, 0x77, 0x78]))
+    cycles("3 chips, 0x78 reads off", setup([0x76, 0x77, 0x78], {0x78: 400000}))
+    driver = setup([0x76, 0x77])
+    driver.read({})
+    driver.bus.i2c.devices[0x77].failed = True
+    cycles("2 chips, 0x77 failed", driver)
+    machine.I2C.default_devices = {0x76: machine.BMP280Device}
+
+if __name__ == "__main__":
+    main()
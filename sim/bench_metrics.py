@@ -0,0 +1,71 @@
+#
+# Fetch The Weather: Weather stations
+# Instrumentation benchmark
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Instruments the simulated station the way main.py does with metrics
+# enabled and runs it for several times the heap ring size, checking the
+# stage counts and health records against the cycles run. Then compares
+# the cost of a reading cycle with and without the wrappers. Run from the
+# repository root:
+#   python -m sim.bench_metrics
+
+import sim
+sim.install()
+
+from ticks import ticks_us, ticks_diff
+from sim import station
+from metrics import Metrics
+
+CYCLES = 100
+SIZE = 16
+EVERY = 10
+
+def instrumented():
+    sensors = station.make_sensors()
+    data = station.make_data(sensors=sensors)
+    metrics = Metrics(SIZE)
+    for driver in sensors.drivers:
+        metrics.instrument(driver, "read", driver.name)
+    metrics.instrument(data, "collect")
+    metrics.attach(data, EVERY)
+    return data, metrics
+
+def check():
+    data, metrics = instrumented()
+    records = 0
+    for cycle in range(1, CYCLES + 1):
+        data.collect()
+        record = data.get_dict()
+        if cycle % EVERY == 0:
+            health = record["health"]
+            assert health["cycles"] == cycle, health
+            for stage in ("collect", "dht11", "mq135", "bmp280"):
+                count, mean, low, high = health["stages"][stage]
+                assert count == EVERY and low <= mean <= high, (stage, health["stages"][stage])
+            records = records + 1
+        else:
+            assert "health" not in record
+    assert metrics.cycles == CYCLES and records == CYCLES // EVERY
+    assert len(metrics.ring_ms) == SIZE and len(metrics.ring_free) == SIZE and len(metrics.ring_used) == SIZE
+    print("%d cycles, ring of %d, %d health records, stage counts match" % (CYCLES, SIZE, records))
+
+def cost(label, data):
+    start = ticks_us()
+    for _ in range(20):
+        data.collect()
+        data.get_dict()
+    print("%-22s %9.1f us/cycle" % (label, ticks_diff(ticks_us(), start) / 20))
+
+def main():
+    check()
+    cost("without metrics", station.make_data())
+    cost("with metrics", instrumented()[0])
+
+if __name__ == "__main__":
+    main()
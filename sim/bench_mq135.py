@@ -0,0 +1,44 @@
+#
+# Fetch The Weather: Weather stations
+# MQ135 acquisition benchmark
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Compares single-sample and burst acquisition of the MQ135 against the
+# simulated noisy ADC: cost per reading and spread of the resulting ppm.
+# Run from the repository root: python -m sim.bench_mq135
+
+import sim
+sim.install()
+
+import math
+from ticks import ticks_us, ticks_diff
+from mq135 import MQ135
+
+READINGS = 500
+
+def bench(label, sensor):
+    values = []
+    start = ticks_us()
+    for _ in range(READINGS):
+        values.append(sensor.snapshot(21.0, 40.0)[5])
+    elapsed = ticks_diff(ticks_us(), start)
+    valid = [v for v in values if v > 0]
+    mean = sum(valid) / len(valid)
+    stddev = math.sqrt(sum((v - mean) * (v - mean) for v in valid) / len(valid))
+    print("%-22s %9.1f us/reading  ppm mean %8.1f  stddev %7.1f  invalid %d" % (
+        label, elapsed / READINGS, mean, stddev, READINGS - len(valid)))
+
+def main():
+    bench("single sample", MQ135(26))
+    bench("burst 9, median", MQ135(26, samples=9, trim=4))
+    bench("burst 9, trim 2", MQ135(26, samples=9, trim=2))
+    bench("burst 16, trim 4", MQ135(26, samples=16, trim=4))
+    bench("burst 32, trim 8", MQ135(26, samples=32, trim=8))
+
+if __name__ == "__main__":
+    main()
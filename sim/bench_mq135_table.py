@@ -0,0 +1,80 @@
+#
+# Fetch The Weather: Weather stations
+# MQ135 lookup table benchmark
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Bounds the error of the table-driven MQ135 conversion against the formula
+# over every ADC code and a sweep of temperature and humidity, failing above
+# MAX_ERROR, then compares the cost per reading of both and the time to
+# build or load the tables. Run from the repository root:
+#   python -m sim.bench_mq135_table
+
+import sim
+sim.install()
+
+import math, os, tempfile
+from ticks import ticks_us, ticks_diff
+from sim import heap
+from mq135 import MQ135
+
+READINGS = 1000
+MAX_ERROR = 0.005 # Relative, table against formula over the specified range
+
+def formula(sensor, code, temperature, humidity):
+    resistance = sensor.resistance_from_raw(code)
+    corrected = resistance / sensor.get_correction_factor(temperature, humidity)
+    return sensor.PARA * math.pow(corrected / sensor.RZERO, -sensor.PARB)
+
+def accuracy(sensor):
+    worst = 0
+    worst_at = None
+    typical = 0
+    # Codes with readings between 10 and 10000 ppm, where the sensor is specified
+    codes = [c for c in range(1, 1023) if 10 <= sensor.table[c] * sensor.table_correction(20, 50) <= 10000]
+    for t in range(-20, 51):
+        for h in range(0, 101, 2):
+            correction = sensor.table_correction(t, h)
+            for code in codes:
+                error = abs(sensor.table[code] * correction / formula(sensor, code, t, h) - 1)
+                if error > worst:
+                    worst = error
+                    worst_at = (code, t, h)
+            if t == 21 and h == 40:
+                typical = max(abs(sensor.table[c] * correction / formula(sensor, c, t, h) - 1) for c in codes)
+    print("codes %d to %d, -20 to 50 C, 0 to 100 %%" % (codes[0], codes[-1]))
+    print("max relative error   %.4f %% at code %d, %d C, %d %%" % ((worst * 100,) + worst_at))
+    print("at 21 C, 40 %%        %.4f %%" % (typical * 100))
+    assert worst <= MAX_ERROR, (worst, worst_at)
+
+def timed(label, fn):
+    start = ticks_us()
+    for _ in range(READINGS):
+        fn()
+    elapsed = ticks_diff(ticks_us(), start) / READINGS
+    print("%-26s %8.1f us/reading %8d %s" % (label, elapsed, heap.allocated(fn, 100), heap.UNIT))
+
+def main():
+    path = tempfile.mktemp(suffix=".bin")
+    sensor = MQ135(26)
+    start = ticks_us()
+    sensor.load_table(path)
+    print("tables built in %.1f ms, %d bytes" % (ticks_diff(ticks_us(), start) / 1000, os.stat(path)[6]))
+    loaded = MQ135(26)
+    start = ticks_us()
+    loaded.load_table(path)
+    print("tables loaded in %.1f ms" % (ticks_diff(ticks_us(), start) / 1000))
+    assert list(loaded.table) == list(sensor.table) and list(loaded.grid) == list(sensor.grid)
+    os.remove(path)
+    accuracy(sensor)
+    sensor.get_adc()
+    timed("snapshot()[5]", lambda: sensor.snapshot(21.0, 40.0)[5])
+    timed("table_ppm()", lambda: sensor.table_ppm(21.0, 40.0))
+    timed("ADC read only", sensor.read_raw)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#
+# Fetch The Weather: Weather stations
+# MQTT transport benchmark
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Sends the same readings over HTTP to the ingest stub and over MQTT with
+# QoS 1 to the broker stub, and reports throughput and bytes on the wire
+# per reading for each format and batch size. Then has the broker drop the
+# connection before acknowledging, checks that every reading still arrives
+# after the reconnects, and checks the keepalive ping. Pass a broker URL to
+# time the MQTT uploads against a real broker such as mosquitto instead,
+# byte counts are only available from the stub. Run from the repository root:
+#   python -m sim.bench_mqtt
+#   python -m sim.bench_mqtt mqtt://127.0.0.1:1883
+
+import sim
+sim.install()
+
+import sys, time
+from ticks import ticks_us, ticks_diff
+from sim import station
+from sim.ingest import IngestServer
+from sim.broker import Broker
+from uploader import Uploader
+from mqtt import MQTTUploader
+
+READINGS = 300
+
+def readings(data, n):
+    records = []
+    for i in range(n):
+        data.collect()
+        record = dict(data.get_dict()) # get_dict() reuses its dict
+        record["timestamp"] = 1700000000 + 60 * i
+        records.append(record)
+    return records
+
+def upload(uploader, records):
+    start = ticks_us()
+    for record in records:
+        uploader.add(record)
+        if uploader.due():
+            assert uploader.flush()
+    return ticks_diff(ticks_us(), start)
+
+def http(records, fmt, batch_size):
+    server = IngestServer(port=0).start()
+    uploader = Uploader(server.url(), batch_size=batch_size, batch_age=3600, verbose=False, fmt=fmt)
+    elapsed = upload(uploader, records)
+    uploader.session.close()
+    server.stop()
+    assert server.readings == len(records)
+    return elapsed, server.bytes_in + server.bytes_out
+
+def mqtt(records, fmt, batch_size, url=None):
+    broker = None
+    if url == None:
+        broker = Broker(port=0).start()
+        url = broker.url()
+    uploader = MQTTUploader(url, 1, batch_size=batch_size, batch_age=3600, verbose=False, fmt=fmt)
+    elapsed = upload(uploader, records)
+    uploader.client.disconnect()
+    if broker == None:
+        return elapsed, None
+    broker.stop()
+    assert broker.readings == len(records) and broker.duplicates == 0
+    return elapsed, broker.bytes_in + broker.bytes_out
+
+def compare(records, url):
+    print("%d readings, bytes include connection setup" % len(records))
+    print("%-16s %6s %-6s %12s %12s" % ("format", "batch", "", "readings/s", "B/reading"))
+    for fmt in ("json", "binary"):
+        for batch_size in (1, 10):
+            for name, run in (("http", http), ("mqtt", lambda r, f, b: mqtt(r, f, b, url))):
+                if name == "http" and url != None:
+                    continue
+                elapsed, nbytes = run(records, fmt, batch_size)
+                size = "%12.1f" % (nbytes / len(records)) if nbytes != None else "%12s" % "-"
+                print("%-16s %6d %-6s %12.0f %s" % (fmt, batch_size, name, len(records) * 1e6 / elapsed, size))
+
+def resend(records):
+    broker = Broker(port=0, drop_after=7).start()
+    uploader = MQTTUploader(broker.url(), 1, max_inflight=4, batch_age=3600, verbose=False)
+    failures = 0
+    for record in records:
+        uploader.add(record)
+        while uploader.flush() == False: # Reconnects and resends on the next try
+            failures = failures + 1
+    uploader.client.disconnect()
+    broker.stop()
+    assert broker.readings - broker.duplicates <= len(records) <= broker.readings, (broker.readings, broker.duplicates)
+    assert len(uploader.client.inflight) == 0
+    print("dropped connections  %d readings, %d acknowledged, %d connections, %d resent, %d duplicates at the broker" % (
+        len(records), uploader.client.acked, broker.connections, uploader.client.resent, broker.duplicates))
+
+def keepalive():
+    broker = Broker(port=0).start()
+    uploader = MQTTUploader(broker.url(), 1, keepalive=1, verbose=False)
+    uploader.add({"weatherStationId": "1", "timestamp": 0})
+    uploader.flush()
+    for _ in range(3):
+        time.sleep(0.6)
+        uploader.poll()
+    uploader.client.disconnect()
+    broker.stop()
+    assert broker.pings > 0 and broker.connections == 1
+    print("keepalive            %d pings on one connection" % broker.pings)
+
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else None
+    records = readings(station.make_data(), READINGS)
+    compare(records, url)
+    if url == None:
+        print()
+        resend(records[:50])
+        keepalive()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#
+# Fetch The Weather: Weather stations
+# Reading store query benchmark
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Checks that range queries through the sparse timestamp index return the
+# same records as a scan of the whole log, on logs that are partly full,
+# wrapped, consumed from the tail and appended to after the index was
+# built. Then fills a log with a week of readings and compares one-hour
+# queries through the index with a scan, counting file reads and time per
+# query. Run from the repository root:
+#   python -m sim.bench_query
+
+import sim
+sim.install()
+
+import os, random, tempfile
+from ticks import ticks_us, ticks_diff
+from ringlog import RingLog
+
+QUERIES = 50
+
+class CountingFile:
+    """Wraps a file and counts readinto() calls"""
+
+    def __init__(self, f):
+        self.f = f
+        self.reads = 0
+
+    def readinto(self, buf):
+        self.reads = self.reads + 1
+        return self.f.readinto(buf)
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+def scan(logfile, start, end):
+    for record in logfile.read(len(logfile)):
+        if start <= record[0] < end:
+            yield record
+
+def same(logfile, rnd, label):
+    # Ranges inside, around and beyond the log, starting and ending on stored timestamps
+    stamps = [record[0] for record in logfile.read(len(logfile))]
+    ranges = [(0, None), (0, 1), (stamps[-1] + 1, None)] if len(stamps) > 0 else [(0, None)]
+    for _ in range(100):
+        if len(stamps) > 0 and rnd.random() < 0.5:
+            start = rnd.choice(stamps)
+            end = rnd.choice(stamps + [None])
+        else:
+            start = rnd.randint(stamps[0] - 600, stamps[-1] + 600) if len(stamps) > 0 else rnd.randint(0, 1000)
+            end = start + rnd.randint(0, 7200)
+        ranges.append((start, end))
+    for start, end in ranges:
+        expected = list(scan(logfile, start, end if end != None else 1 << 32))
+        assert list(logfile.query(start, end)) == expected, (label, start, end)
+    return len(ranges)
+
+def check():
+    rnd = random.Random(2)
+    path = tempfile.mktemp(suffix=".bin")
+    logfile = RingLog(path, 300)
+    logfile.open()
+    timestamp = 1700000000
+    checked = same(logfile, rnd, "empty")
+    for label, appends, consume in (("partly full", 100, 0), ("after appends", 150, 0), ("wrapped", 400, 0),
+                                    ("consumed", 0, 130), ("appended after consume", 90, 0), ("wrapped again", 700, 0),
+                                    ("consumed to empty", 0, 300), ("refilled", 50, 0)):
+        for _ in range(appends):
+            timestamp = timestamp + rnd.choice((1, 60, 60, 60, 3600)) # Irregular gaps, some readings a second apart
+            logfile.append(timestamp, 21.0, 45.0, 420.0, 101325.0)
+        logfile.consume(consume)
+        checked = checked + same(logfile, rnd, label)
+        if label == "wrapped":
+            logfile.close()
+            logfile.open() # The index is built again from the file
+    logfile.close()
+    os.remove(path)
+    print("%d indexed queries match a full scan, on empty, wrapped and consumed logs" % checked)
+
+def bench(name, logfile, query, ranges):
+    logfile.file.reads = 0
+    found = 0
+    begin = ticks_us()
+    for start, end in ranges:
+        for record in query(start, end):
+            found = found + 1
+    elapsed = ticks_diff(ticks_us(), begin)
+    print("%-14s %10.1f us/query %10.1f reads/query %8.1f records/query" % (
+        name, elapsed / len(ranges), logfile.file.reads / len(ranges), found / len(ranges)))
+
+def main():
+    check()
+    path = tempfile.mktemp(suffix=".bin")
+    logfile = RingLog(path, 10080)
+    logfile.open()
+    first = 1700000000
+    for i in range(12000): # Wraps once, a week of one reading a minute stays
+        logfile.append(first + 60 * i, 21.0, 45.0, 420.0, 101325.0)
+    logfile.file = CountingFile(logfile.file)
+    rnd = random.Random(1)
+    oldest = first + 60 * (12000 - 10080)
+    ranges = []
+    for _ in range(QUERIES):
+        start = rnd.randint(oldest, first + 60 * 12000)
+        ranges.append((start, start + 3600))
+    next(logfile.query(0)) # Builds the index
+    print("%d readings in the log, one-hour queries" % len(logfile))
+    bench("indexed", logfile, logfile.query, ranges)
+    bench("full scan", logfile, lambda s, e: scan(logfile, s, e), ranges)
+    logfile.close()
+    os.remove(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#
+# Fetch The Weather: Weather stations
+# Report-by-exception benchmark
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Replays a trace of readings through the report-by-exception filter and
+# reports how many uploads it saves against the error of the values the
+# server reconstructs from the readings it receives, using the same
+# predictor. Without an argument the trace is two simulated days of one
+# reading a minute, a station logfile can be replayed instead:
+#   python -m sim.bench_report
+#   python -m sim.bench_report log.bin
+
+import sim
+sim.install()
+
+import math, random, sys
+from sim import station
+from report import Reporter
+from ringlog import RingLog
+
+FIELDS = ("temperatureCelsius", "humidityPercent", "airQualityPpm", "airPressureHpa")
+DAY = 86400
+
+def simulated(days=2, interval=60, seed=1):
+    """Returns a day/night cycle with DHT11 resolution, slow pressure drift and pollution events"""
+    rnd = random.Random(seed)
+    records = []
+    ppm_event = 0.0
+    for i in range(days * DAY // interval):
+        t = i * interval
+        phase = 2 * math.pi * (t % DAY) / DAY
+        temp = 12 + 6 * math.sin(phase - 2.4) + rnd.gauss(0, 0.3)
+        humidity = 70 - 20 * math.sin(phase - 2.4) + rnd.gauss(0, 1)
+        pressure = 101300 + 250 * math.sin(2 * math.pi * t / (3 * DAY)) + rnd.gauss(0, 4)
+        if rnd.random() < 0.002: # Traffic, a fire nearby
+            ppm_event = ppm_event + rnd.uniform(100, 400)
+        ppm_event = ppm_event * 0.9
+        ppm = 420 + ppm_event + rnd.gauss(0, 6)
+        records.append({"weatherStationId": "1", "temperatureCelsius": round(temp), "airPressureHpa": pressure,
+                        "airQualityPpm": ppm, "humidityPercent": round(humidity), "timestamp": 1700000000 + t})
+    return records
+
+def logged(path):
+    logfile = RingLog(path)
+    logfile.open()
+    data = station.make_data(sensors=False)
+    records = [data.from_record(r) for r in logfile.read(len(logfile))]
+    logfile.close()
+    return records
+
+def scaled(deadband, scale):
+    bands = {}
+    for field in deadband:
+        bands[field] = {}
+        for kind in deadband[field]:
+            bands[field][kind] = deadband[field][kind] * scale
+    return bands
+
+def run(records, deadband, heartbeat, predict):
+    """Returns readings sent, then RMS and max reconstruction error per field"""
+    reporter = Reporter(deadband, heartbeat=heartbeat, predict=predict)
+    squares = [0.0] * len(FIELDS)
+    worst = [0.0] * len(FIELDS)
+    for record in records:
+        record = dict(record)
+        guesses = None
+        if reporter.last != None:
+            guesses = [reporter.predict(field, record["timestamp"]) for field in FIELDS]
+        if reporter.check(record) or guesses == None:
+            continue # The server has the real reading
+        for i in range(len(FIELDS)):
+            error = abs(record[FIELDS[i]] - guesses[i])
+            squares[i] = squares[i] + error * error
+            if error > worst[i]:
+                worst[i] = error
+    rms = [math.sqrt(s / len(records)) for s in squares]
+    return reporter.sent, rms, worst
+
+def main():
+    if len(sys.argv) > 1:
+        records = logged(sys.argv[1])
+        print("Trace: " + str(len(records)) + " readings from " + sys.argv[1])
+    else:
+        records = simulated()
+        print("Trace: " + str(len(records)) + " simulated readings, one a minute")
+    settings = station.make_config().config["report"]
+    print("%-8s %5s %6s %9s   %-15s %-15s %-15s %-15s" % ("predict", "band", "sent", "saved", "temp rms/max", "hum rms/max", "ppm rms/max", "pres rms/max"))
+    for predict in ("hold", "linear"):
+        for scale in (0.5, 1, 2):
+            sent, rms, worst = run(records, scaled(settings["deadband"], scale), settings["heartbeat"], predict)
+            errors = ["%6.2f/%-8.2f" % (rms[i], worst[i]) for i in range(len(FIELDS))]
+            print("%-8s %5.1f %6d %8.1f%%   %s" % (predict, scale, sent, 100 - 100.0 * sent / len(records), " ".join(errors)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#
+# Fetch The Weather: Weather stations
+# Wi-Fi supervisor check
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Drives the Wi-Fi supervisor through the scripted WLAN on a simulated
+# clock: attempts that never connect, the connect timeout, the exponential
+# backoff with its jitter and cap, a lost link and the warm start BSSID.
+# Checks the attempt counts, the times of every attempt and the stats()
+# reported in the health record. Run from the repository root:
+#   python -m sim.bench_wifi
+
+import sim
+sim.install()
+
+import random
+import network
+from wifi import WifiSupervisor, UP
+from metrics import Metrics
+
+STEP = 50 # ms between polls
+TIMEOUT = 10000
+BACKOFF_MIN = 2000
+BACKOFF_MAX = 16000
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+class Station:
+    """A supervisor polled every STEP ms, with the time of every connect()"""
+
+    def __init__(self, script, bssid=None):
+        self.clock = Clock()
+        network.WLAN.clock = self.clock
+        network.WLAN.script = script
+        self.wlan = network.WLAN(network.WLAN.IF_STA)
+        self.started = []
+        connect = self.wlan.connect
+        def timed_connect(*args, **kwargs):
+            self.started.append(self.clock.now)
+            connect(*args, **kwargs)
+        self.wlan.connect = timed_connect
+        self.ups = 0
+        self.downs = 0
+        self.wifi = WifiSupervisor(self.wlan, "sim", "secret", connect_timeout_ms=TIMEOUT, backoff_min_ms=BACKOFF_MIN,
+                                   backoff_max_ms=BACKOFF_MAX, bssid=bssid, channel=6, on_up=self.up, on_down=self.down)
+
+    def up(self):
+        self.ups = self.ups + 1
+
+    def down(self):
+        self.downs = self.downs + 1
+
+    def run(self, until):
+        """Polls until the link is up or until ms have passed, returns the time"""
+        while self.clock.now < until:
+            if self.wifi.poll(self.clock.now):
+                return self.clock.now
+            self.clock.now = self.clock.now + STEP
+        return None
+
+def backoff(failures):
+    delay = min(BACKOFF_MAX, BACKOFF_MIN << (failures - 1))
+    return delay // 2, delay
+
+def check_retries():
+    # Five attempts that never connect, the sixth connects after 700 ms
+    station = Station([None] * 5 + [700])
+    online_at = station.run(600000)
+    wifi = station.wifi
+    assert online_at != None and wifi.state == UP
+    assert wifi.attempts == 6 and wifi.connects == 1 and wifi.failures == 0 and station.ups == 1, wifi.stats()
+    assert len(station.started) == 6 and station.started[0] == 0
+    for i in range(1, 6):
+        # Every failed attempt is given up after the timeout and retried after the backoff
+        low, high = backoff(i)
+        gap = station.started[i] - station.started[i - 1] - TIMEOUT
+        assert low <= gap <= high + STEP, (i, gap, low, high)
+    assert 700 <= wifi.last_connect_ms <= 700 + STEP and online_at - station.started[5] == wifi.last_connect_ms
+    print("retries              6 attempts, backoff gaps %s ms, online after %d ms" % (
+        [station.started[i] - station.started[i - 1] - TIMEOUT for i in range(1, 6)], online_at))
+    return station
+
+def check_reconnect(station):
+    # The access point goes away, the link is reconnected straight away without a backoff
+    wifi = station.wifi
+    station.wlan.script = [300]
+    station.clock.now = station.clock.now + 5000
+    station.wlan.drop()
+    lost_at = station.clock.now
+    online_at = station.run(lost_at + 60000)
+    assert online_at != None and station.downs == 1 and station.ups == 2
+    assert wifi.losses == 1 and wifi.attempts == 7 and wifi.connects == 2, wifi.stats()
+    assert station.started[-1] == lost_at and 300 <= online_at - lost_at <= 300 + STEP
+    print("reconnect            back online %d ms after the link was lost" % (online_at - lost_at))
+
+def check_warm_start():
+    # The cached BSSID is used for the first attempt only, a retry scans again
+    station = Station([None, 200], bssid=b"\x02\x00\x00\x00\x00\x01")
+    assert station.run(60000) != None
+    assert station.wlan.joined == [b"\x02\x00\x00\x00\x00\x01", None], station.wlan.joined
+    print("warm start           BSSID on the first attempt, scan on the retry")
+
+def check_cap():
+    # Backoff stops growing at backoff_max_ms
+    station = Station([None] * 8)
+    station.run(400000)
+    gaps = [station.started[i] - station.started[i - 1] - TIMEOUT for i in range(1, len(station.started))]
+    assert len(gaps) >= 7 and max(gaps) <= BACKOFF_MAX + STEP and min(gaps[4:7]) >= BACKOFF_MAX // 2, gaps
+    print("backoff cap          %d attempts in %d s, longest gap %d ms" % (station.wifi.attempts, station.clock.now // 1000, max(gaps)))
+
+def check_stats(station):
+    metrics = Metrics(4)
+    metrics.watch("wifi", station.wifi.stats)
+    stats = metrics.summary()["wifi"]
+    assert stats["state"] == UP and stats["attempts"] == 7 and stats["connects"] == 2 and stats["losses"] == 1
+    assert stats["meanConnectMs"] == (700 + 300) // 2 and stats["lastConnectMs"] == 300, stats
+    print("health record        %s" % stats)
+
+def main():
+    random.seed(1)
+    station = check_retries()
+    check_reconnect(station)
+    check_stats(station)
+    check_warm_start()
+    check_cap()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#
+# Fetch The Weather: Weather stations
+# Wire format benchmark
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Round-trips simulated readings through the binary encoding and compares
+# body size and encoding throughput with the JSON upload format, then sends
+# the same batches to the ingest stub in every format and reports bytes on
+# the wire per reading. Run from the repository root:
+# python -m sim.bench_wire
+
+import sim
+sim.install()
+
+import json
+from ticks import ticks_us, ticks_diff
+from sim import station
+from sim.ingest import IngestServer
+from uploader import Uploader
+import wire
+
+ROUNDS = 50
+
+def readings(data, n):
+    records = []
+    for i in range(n):
+        data.sensors.get("bmp280").sensor._last_read_ts = None
+        data.collect()
+        record = dict(data.get_dict()) # get_dict() reuses its dict
+        record["timestamp"] = 1700000000 + 60 * i
+        records.append(record)
+    return records
+
+def check(records, decoded):
+    for a, b in zip(records, decoded):
+        for key in ("weatherStationId", "timestamp"):
+            assert str(a[key]) == str(b[key]), key
+        for key, tolerance in (("temperatureCelsius", 0.005), ("humidityPercent", 0.005),
+                               ("airQualityPpm", a["airQualityPpm"] * 1e-6), ("airPressureHpa", a["airPressureHpa"] * 1e-6)):
+            assert abs(a[key] - b[key]) <= tolerance, key
+
+def encoders():
+    return (("json", lambda r: json.dumps(r).encode()),
+            ("binary", lambda r: wire.encode(r)),
+            ("binary+deflate", lambda r: wire.encode(r, True)))
+
+def main():
+    data = station.make_data()
+    print("%-16s %6s %10s %10s %12s" % ("format", "batch", "bytes", "B/reading", "us/encode"))
+    for n in (1, 10, 60):
+        records = readings(data, n)
+        check(records, wire.decode(wire.encode(records)))
+        check(records, wire.decode(wire.encode(records, True)))
+        for name, encode in encoders():
+            size = len(encode(records))
+            start = ticks_us()
+            for _ in range(ROUNDS):
+                encode(records)
+            elapsed = ticks_diff(ticks_us(), start) / ROUNDS
+            print("%-16s %6d %10d %10.1f %12.1f" % (name, n, size, size / n, elapsed))
+    print()
+    server = IngestServer(port=0).start()
+    records = readings(data, 60)
+    for fmt in ("json", "binary", "binary+deflate"):
+        server.reset()
+        uploader = Uploader(server.url(), batch_size=10, batch_age=3600, verbose=False, fmt=fmt)
+        for record in records:
+            uploader.add(record)
+            if uploader.due():
+                uploader.flush()
+        print("%-16s %d readings in %d requests, %.1f B/reading on the wire" % (
+            fmt, server.readings, server.requests, (server.bytes_in + server.bytes_out) / server.readings))
+    server.stop()
+
+if __name__ == "__main__":
+    main()
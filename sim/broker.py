@@ -0,0 +1,153 @@
+#
+# Fetch The Weather: Weather stations
+# Local MQTT broker stub
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Stand-in for an MQTT 3.1.1 broker with just what the station uses:
+# CONNECT with a kept session, PUBLISH with QoS 0 and 1, PINGREQ and
+# DISCONNECT. Nothing is routed to subscribers, published readings are
+# only counted, along with connections, resent duplicates and the bytes
+# moved in both directions. drop_after closes the connection after that
+# many publishes without acknowledging the last one, to exercise resends.
+
+import json, socket
+import wire
+
+try:
+    import _thread
+except ImportError:
+    import thread as _thread
+
+def count_readings(topic, payload):
+    """Returns the number of readings in a published message"""
+    if topic.endswith("/wire") or topic.endswith("/wire+deflate"):
+        return len(wire.decode(payload))
+    data = json.loads(payload)
+    if type(data) is list:
+        return len(data)
+    return 1
+
+class Broker:
+    def __init__(self, host="127.0.0.1", port=1883, drop_after=0):
+        self.host = host
+        self.port = port
+        self.drop_after = drop_after
+        self.sock = None
+        self.sessions = set() # Client IDs with a kept session
+        self.reset()
+
+    def url(self):
+        return "mqtt://" + self.host + ":" + str(self.port)
+
+    def start(self):
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(socket.getaddrinfo(self.host, self.port)[0][-1])
+        if self.port == 0 and hasattr(self.sock, "getsockname"):
+            self.port = self.sock.getsockname()[1]
+        self.sock.listen(16)
+        _thread.start_new_thread(self._accept, ())
+        return self
+
+    def stop(self):
+        if self.sock != None:
+            self.sock.close()
+            self.sock = None
+
+    def reset(self):
+        self.connections = 0
+        self.messages = 0
+        self.duplicates = 0 # Publishes with the DUP flag
+        self.readings = 0
+        self.pings = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.dropped = 0
+
+    def _accept(self):
+        while self.sock != None:
+            try:
+                conn, addr = self.sock.accept()
+            except OSError:
+                return
+            _thread.start_new_thread(self._serve, (conn,))
+
+    def _read(self, f, size):
+        data = f.read(size) if size > 0 else b""
+        if len(data) < size:
+            raise OSError("connection closed")
+        return data
+
+    def _packet(self, f):
+        kind = self._read(f, 1)[0]
+        length = 0
+        shift = 0
+        size = 1
+        while True:
+            b = self._read(f, 1)[0]
+            size = size + 1
+            length = length | ((b & 0x7F) << shift)
+            shift = shift + 7
+            if b & 0x80 == 0:
+                break
+        self.bytes_in = self.bytes_in + size + length
+        return kind, self._read(f, length)
+
+    def _reply(self, f, data):
+        self.bytes_out = self.bytes_out + len(data)
+        f.write(data)
+        f.flush()
+
+    def _serve(self, conn):
+        f = conn.makefile("rwb")
+        published = 0
+        try:
+            kind, body = self._packet(f)
+            if kind != 0x10:
+                raise OSError("expected CONNECT")
+            flags = body[7]
+            n = (body[10] << 8) | body[11]
+            client_id = body[12:12 + n].decode()
+            present = client_id in self.sessions and flags & 0x02 == 0
+            if flags & 0x02 == 0:
+                self.sessions.add(client_id)
+            self.connections = self.connections + 1
+            self._reply(f, bytes((0x20, 2, 1 if present else 0, 0)))
+            while True:
+                kind, body = self._packet(f)
+                if kind & 0xF0 == 0x30:
+                    qos = (kind >> 1) & 3
+                    n = (body[0] << 8) | body[1]
+                    topic = body[2:2 + n].decode()
+                    pos = 2 + n
+                    if qos > 0:
+                        packet_id = body[pos:pos + 2]
+                        pos = pos + 2
+                    published = published + 1
+                    if self.drop_after > 0 and published >= self.drop_after:
+                        self.dropped = self.dropped + 1
+                        break # Gone before the PUBACK
+                    # Counted before the PUBACK, so the client never sees an acknowledgement that is not counted yet
+                    self.messages = self.messages + 1
+                    if kind & 0x08:
+                        self.duplicates = self.duplicates + 1
+                    self.readings = self.readings + count_readings(topic, body[pos:])
+                    if qos > 0:
+                        self._reply(f, b"\x40\x02" + packet_id)
+                elif kind == 0xC0:
+                    self.pings = self.pings + 1
+                    self._reply(f, b"\xd0\x00")
+                elif kind == 0xE0:
+                    break
+        except (OSError, ValueError, IndexError):
+            pass
+        try:
+            f.close()
+        except OSError:
+            pass
+        conn.close()
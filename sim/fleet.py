@@ -0,0 +1,256 @@
+#
+# Fetch The Weather: Weather stations
+# Fleet load simulator
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Runs many virtual stations in one process against the local ingest stub
+# and reports how their uploads load the endpoint: request rate peaks,
+# thundering-herd seconds and how long the backlog takes to drain after a
+# network outage. Every station has its own Data, Config, Uploader, RingLog,
+# Replay and WifiSupervisor from the station code, on a simulated WLAN that
+# cannot connect during the outage, and runs the reading cycle of main.py;
+# the sensors are simulated and shared. Time is virtual, an asyncio task per
+# station sleeps on a shared clock that jumps from event to event, so an
+# hour of a thousand stations runs in about a minute. Requests
+# really go to the stub, but all stations share one keep-alive Session, so
+# herds of connection and TLS setups are not modeled. CPython only:
+#   python -m sim.fleet --stations 1000 --jitter 0
+#   python -m sim.fleet --stations 1000 --jitter 60 --outage 600:1800 --capacity 50
+
+import sim
+sim.install()
+
+import argparse, asyncio, heapq, random, shutil, sys, tempfile
+
+from sim import station
+from sim.ingest import IngestServer
+import main, network
+from uploader import Uploader
+from session import Session
+from ringlog import RingLog
+from replay import Replay
+from wifi import WifiSupervisor
+from ticks import ticks_add
+
+BASE_TIME = 1700000000 # Virtual time 0 on the station clocks
+
+class Clock:
+    """Virtual time for asyncio tasks, sleep() returns at once when nothing runs earlier"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.events = []
+        self.seq = 0
+
+    def sleep(self, delay):
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(self.events, (self.now + max(0, delay), self.seq, future))
+        self.seq = self.seq + 1
+        return future
+
+    async def run(self, until):
+        await asyncio.sleep(0) # Tasks that were just created get to their first sleep
+        while len(self.events) > 0 and self.events[0][0] <= until:
+            self.now = self.events[0][0]
+            while len(self.events) > 0 and self.events[0][0] == self.now:
+                heapq.heappop(self.events)[2].set_result(None)
+            await asyncio.sleep(0) # The woken tasks run up to their next sleep
+        self.now = until
+
+class WLAN(network.WLAN):
+    """Simulated interface that loses its link and cannot connect during the outage"""
+
+    def __init__(self, fleet, connect_ms):
+        network.WLAN.__init__(self, network.WLAN.IF_STA)
+        self.fleet = fleet
+        self.connect_ms = connect_ms # Association and DHCP
+
+    def connect(self, ssid=None, key=None, bssid=None):
+        network.WLAN.connect(self, ssid, key, bssid)
+        if self.fleet.down():
+            self.connected_at = None # This attempt never succeeds
+        else:
+            self.connected_at = ticks_add(network.WLAN.clock(), self.connect_ms)
+
+    def isconnected(self):
+        return self.fleet.down() == False and network.WLAN.isconnected(self)
+
+class Station:
+    def __init__(self, fleet, number, sensors, rnd):
+        args = fleet.args
+        self.fleet = fleet
+        config = station.make_config(number)
+        self.data = main.Data(sensors, config)
+        self.data.first_reading_ms = 0 # No boot time message
+        upload = config.config["upload"]
+        self.uploader = Uploader(fleet.server.url(), batch_size=upload["batch_size"], batch_age=upload["batch_age"], verbose=False, fmt=upload.get("format", "json"))
+        self.uploader.session = fleet.session
+        self.logfile = RingLog(fleet.directory + "/" + str(number) + ".bin", args.logrecords)
+        self.logfile.open()
+        self.replay = Replay(self.logfile, self.uploader, self.data.from_record, chunk=config.config["replay"]["chunk"], interval=config.config["replay"]["interval"])
+        self.start = rnd.uniform(0, args.jitter)
+        self.offset = rnd.uniform(-args.skew, args.skew) # Clock error in seconds
+        self.rate = 1 + rnd.uniform(-args.drift, args.drift) * 1e-6
+        self.wifi = WifiSupervisor(WLAN(fleet, int(rnd.uniform(1000, 3000))), "sim", "", on_up=self.link_up,
+                                   on_down=lambda: main.link_down(self.uploader, self.log))
+        self.back_at = None # Virtual time the link came back after the outage
+        self.drained_at = None
+
+    def time(self):
+        return BASE_TIME + self.fleet.clock.now * self.rate + self.offset
+
+    def check_link(self):
+        return self.wifi.poll(int(self.fleet.clock.now * 1000))
+
+    def link_up(self):
+        outage = self.fleet.outage
+        if outage != None and self.back_at == None and self.fleet.clock.now >= outage[1]:
+            self.back_at = self.fleet.clock.now
+
+    def log(self, record):
+        self.logfile.append(record["timestamp"], record["temperatureCelsius"], record["humidityPercent"], record["airQualityPpm"], record["airPressureHpa"])
+
+    async def run(self):
+        clock = self.fleet.clock
+        await clock.sleep(self.start)
+        self.check_link() # Starts connecting at boot
+        while True:
+            now = self.time()
+            self.data.collect()
+            record = self.data.get_dict()
+            record["timestamp"] = int(now)
+            if self.check_link() == True:
+                main.upload(record, self.uploader, self.replay, self.log, now=now)
+                if self.back_at != None and self.drained_at == None and len(self.logfile) == 0:
+                    self.drained_at = clock.now
+            else:
+                self.log(record)
+            for i in range(main.INTERVAL): # Keeps the Wi-Fi supervisor going while waiting, as main.py does
+                await clock.sleep(1 / self.rate)
+                self.check_link()
+
+class Fleet:
+    def __init__(self, args):
+        self.args = args
+        self.clock = Clock()
+        self.outage = None
+        if args.outage != None:
+            start, end = args.outage.split(":")
+            self.outage = (float(start), float(end))
+        self.server = IngestServer(port=0)
+        self.session = None
+        self.directory = None
+        self.per_second = {} # Virtual second: requests
+        network.WLAN.clock = lambda: int(self.clock.now * 1000) # Station interfaces run on virtual time
+        self.statuses = {}
+
+    def request(self, post):
+        # Counts each request in its virtual second, over capacity the stub answers 503
+        def wrapper(body, content_type="application/json"):
+            second = int(self.clock.now)
+            count = self.per_second.get(second, 0) + 1
+            self.per_second[second] = count
+            if self.args.capacity > 0 and count > self.args.capacity:
+                self.server.status = 503
+            else:
+                self.server.status = 200
+            status, text = post(body, content_type)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            return status, text
+        return wrapper
+
+    def down(self):
+        return self.outage != None and self.outage[0] <= self.clock.now < self.outage[1]
+
+    async def main(self):
+        rnd = random.Random(self.args.seed)
+        random.seed(self.args.seed) # The backoff jitter of the supervisors
+        sensors = station.make_sensors()
+        for driver in sensors.drivers:
+            driver.interval = 1 # Stations share the values of one set of sensors
+        stations = [Station(self, i + 1, sensors, rnd) for i in range(self.args.stations)]
+        tasks = [asyncio.ensure_future(s.run()) for s in stations]
+        await self.clock.run(self.args.duration)
+        for task in tasks:
+            task.cancel()
+        for s in stations:
+            s.logfile.close()
+        return stations
+
+    def run(self):
+        self.server.start()
+        self.session = Session(self.server.url())
+        self.session.post = self.request(self.session.post)
+        self.directory = tempfile.mkdtemp(prefix="ftw-fleet-")
+        stdout = sys.stdout
+        sys.stdout = Sink() # Station messages are counted, not printed
+        try:
+            stations = asyncio.run(self.main())
+        finally:
+            lines = sys.stdout.lines
+            sys.stdout = stdout
+            self.server.stop()
+            shutil.rmtree(self.directory)
+        self.report(stations, lines)
+
+    def report(self, stations, lines):
+        args = self.args
+        seconds = sorted(self.per_second)
+        total = sum(self.per_second.values())
+        mean = total / args.duration
+        peak = max(self.per_second.values()) if total > 0 else 0
+        window = {}
+        for second in seconds:
+            window[second // 10] = window.get(second // 10, 0) + self.per_second[second]
+        herd = [s for s in seconds if self.per_second[s] >= max(10, 10 * mean)]
+        print("%d stations for %d s, start jitter %g s, clock skew %g s, drift %g ppm" % (args.stations, args.duration, args.jitter, args.skew, args.drift))
+        print("requests            %d (%.1f/s mean), %d readings accepted" % (total, mean, self.server.readings))
+        print("peak                %d/s, %d in 10 s" % (peak, max(window.values()) if total > 0 else 0))
+        print("herd seconds        %d with at least 10x the mean rate" % len(herd))
+        print("statuses            " + str(self.statuses))
+        print("station messages    " + str(lines))
+        print("connections         %d, one Session shared by all stations, setup herds not modeled" % self.session.connections)
+        if self.outage != None:
+            back = sorted(s.back_at - self.outage[1] for s in stations if s.back_at != None)
+            if len(back) == 0:
+                back = [float("nan")]
+            drained = sorted(s.drained_at - self.outage[1] for s in stations if s.drained_at != None)
+            left = sum(len(s.logfile) for s in stations)
+            print("outage              %g s to %g s" % self.outage)
+            print("reconnected         median %.0f s, last %.0f s after the outage (%d of %d stations)" % (
+                back[len(back) // 2], back[-1], len([s for s in stations if s.back_at != None]), len(stations)))
+            if len(drained) > 0:
+                print("backlog drained     median %.0f s, 95%% %.0f s, last %.0f s after the outage (%d of %d stations)" % (
+                    drained[len(drained) // 2], drained[len(drained) * 95 // 100], drained[-1], len(drained), len(stations)))
+            print("backlog left        %d readings" % left)
+
+class Sink:
+    def __init__(self):
+        self.lines = 0
+
+    def write(self, text):
+        self.lines = self.lines + text.count("\n")
+
+    def flush(self):
+        pass
+
+def main_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fleet load simulator")
+    parser.add_argument("--stations", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=3600, help="virtual seconds")
+    parser.add_argument("--jitter", type=float, default=0, help="boot times spread over this many seconds")
+    parser.add_argument("--skew", type=float, default=0, help="largest station clock error in seconds")
+    parser.add_argument("--drift", type=float, default=0, help="largest station clock drift in ppm")
+    parser.add_argument("--outage", default=None, help="network outage start:end in virtual seconds")
+    parser.add_argument("--capacity", type=int, default=0, help="requests per second the endpoint accepts, 0 for no limit")
+    parser.add_argument("--logrecords", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    Fleet(main_args()).run()
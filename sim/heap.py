@@ -0,0 +1,44 @@
+#
+# Fetch The Weather: Weather stations
+# Heap measurement helpers
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# On MicroPython the collector is switched off while fn runs, so the growth
+# of gc.mem_alloc() is the number of bytes allocated per iteration. CPython
+# has no such counter, the peak of tracemalloc above the starting point
+# over all iterations is reported instead.
+
+import gc
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+UNIT = "B peak" if tracemalloc != None else "B alloc"
+
+def allocated(fn, iterations=10):
+    """Returns the heap use of fn in the unit named by UNIT"""
+    fn() # Warm up caches and lazily created objects
+    gc.collect()
+    if tracemalloc != None:
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        for _ in range(iterations):
+            fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak - start
+    gc.disable()
+    try:
+        start = gc.mem_alloc()
+        for _ in range(iterations):
+            fn()
+        return (gc.mem_alloc() - start) // iterations
+    finally:
+        gc.enable()
@@ -0,0 +1,154 @@
+#
+# Fetch The Weather: Weather stations
+# Local HTTP ingest stub
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Plain-HTTP stand-in for the weather data endpoint. It accepts POSTs on
+# any path, answers with a fixed status and counts connections, requests,
+# readings and the bytes moved in both directions. Each connection is
+# served on its own thread and kept alive until the client closes it.
+
+import json, socket
+import wire
+
+try:
+    import _thread
+except ImportError:
+    import thread as _thread
+
+def count_json(content_type, body):
+    """Returns the number of readings in a JSON body"""
+    data = json.loads(body)
+    if type(data) is list:
+        return len(data)
+    return 1
+
+def count_wire(content_type, body):
+    """Returns the number of readings in a binary body"""
+    return len(wire.decode(body))
+
+class IngestServer:
+    def __init__(self, host="127.0.0.1", port=8642, status=200, counters=None, binary=True):
+        self.host = host
+        self.port = port
+        self.status = status
+        # Content type: function returning the number of readings in a body,
+        # other content types are answered with 415
+        self.counters = {"application/json": count_json}
+        if binary:
+            self.counters[wire.CONTENT_TYPE] = count_wire
+            self.counters[wire.CONTENT_TYPE_DEFLATE] = count_wire
+        if counters != None:
+            self.counters.update(counters)
+        self.sock = None
+        self.connections = 0
+        self.requests = 0
+        self.readings = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.statuses = {}
+
+    def url(self, path="/ws/weather/data"):
+        return "http://" + self.host + ":" + str(self.port) + path
+
+    def start(self):
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(socket.getaddrinfo(self.host, self.port)[0][-1])
+        if self.port == 0 and hasattr(self.sock, "getsockname"):
+            self.port = self.sock.getsockname()[1]
+        self.sock.listen(16)
+        _thread.start_new_thread(self._accept, ())
+        return self
+
+    def stop(self):
+        if self.sock != None:
+            self.sock.close()
+            self.sock = None
+
+    def reset(self):
+        self.connections = 0
+        self.requests = 0
+        self.readings = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.statuses = {}
+
+    def _accept(self):
+        while self.sock != None:
+            try:
+                conn, addr = self.sock.accept()
+            except OSError:
+                return
+            self.connections = self.connections + 1
+            _thread.start_new_thread(self._serve, (conn,))
+
+    def _serve(self, conn):
+        f = conn.makefile("rwb")
+        try:
+            while self._request(f):
+                pass
+        except (OSError, ValueError):
+            pass
+        try:
+            f.close()
+        except OSError:
+            pass
+        conn.close()
+
+    def _request(self, f):
+        line = f.readline()
+        if not line:
+            return False
+        received = len(line)
+        length = 0
+        content_type = "application/json"
+        keep_alive = True
+        while True:
+            line = f.readline()
+            received = received + len(line)
+            if not line or line == b"\r\n":
+                break
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            value = value.strip().decode()
+            if name == b"content-length":
+                length = int(value)
+            elif name == b"content-type":
+                content_type = value.split(";")[0]
+            elif name == b"connection" and value.lower() == "close":
+                keep_alive = False
+        body = b""
+        while len(body) < length:
+            chunk = f.read(length - len(body))
+            if not chunk:
+                return False
+            body = body + chunk
+        received = received + length
+        status = self.status
+        readings = 0
+        if content_type not in self.counters:
+            status = 415
+        else:
+            try:
+                readings = self.counters[content_type](content_type, body)
+            except ValueError:
+                status = 400
+        reply = b'{"status":"ok"}' if status == 200 else b'{"status":"error"}'
+        head = "HTTP/1.1 " + str(status) + " OK\r\nContent-Type: application/json\r\nContent-Length: " + str(len(reply)) + "\r\n\r\n"
+        # Counted before replying, so the client never sees a reply that is not counted yet
+        self.requests = self.requests + 1
+        if status == 200:
+            self.readings = self.readings + readings
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes_in = self.bytes_in + received
+        self.bytes_out = self.bytes_out + len(head) + len(reply)
+        f.write(head.encode() + reply)
+        if hasattr(f, "flush"):
+            f.flush()
+        return keep_alive
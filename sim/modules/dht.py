@@ -0,0 +1,47 @@
+#
+# Fetch The Weather: Weather stations
+# Simulated dht module
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+import random
+
+class DHT11:
+    """DHT11 returning slowly wandering whole-number readings
+
+    Like the real sensor the first measure() after power up fails with a
+    checksum error. Set present to False to simulate a missing sensor.
+    """
+
+    present = True
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.measurements = 0
+        self.temp = 21
+        self.hum = 45
+
+    def measure(self):
+        self.measurements = self.measurements + 1
+        if not DHT11.present:
+            raise OSError(110) # ETIMEDOUT
+        if self.measurements == 1:
+            raise OSError("checksum error")
+        r = random.random()
+        if r < 0.05:
+            self.temp = self.temp + (1 if r < 0.025 else -1)
+        elif r > 0.95:
+            self.hum = min(95, max(20, self.hum + (1 if r > 0.975 else -1)))
+
+    def temperature(self):
+        return self.temp
+
+    def humidity(self):
+        return self.hum
+
+class DHT22(DHT11):
+    pass
@@ -0,0 +1,164 @@
+#
+# Fetch The Weather: Weather stations
+# Simulated machine module
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+import random
+
+try:
+    from ustruct import pack_into as struct_pack_into
+except ImportError:
+    from struct import pack_into as struct_pack_into
+
+class Pin:
+    IN = 0
+    OUT = 1
+
+    def __init__(self, id, mode=-1, pull=-1):
+        self.id = id
+
+class ADC:
+    """ADC returning a noisy signal
+
+    level is the 16 bit value around which readings scatter by up to noise
+    counts. A fraction spikes of the readings are replaced by full-scale or
+    zero glitches, like the ones seen on the ESP32 ADC.
+    """
+
+    # Per pin signal settings, can be changed by benchmarks before creating ADCs
+    levels = {}
+    noise = 600
+    spikes = 0.02
+
+    def __init__(self, pin, atten=None):
+        self.pin = pin
+        self.level = ADC.levels.get(getattr(pin, "id", pin), 11500)
+        self.reads = 0
+
+    def read_u16(self):
+        self.reads = self.reads + 1
+        r = random.random()
+        if r < ADC.spikes:
+            return 65535 if r < ADC.spikes / 2 else 0
+        # Sum of uniforms, close enough to gaussian noise
+        n = (random.random() + random.random() + random.random() - 1.5) * ADC.noise
+        return min(65535, max(0, int(self.level + n)))
+
+    def read(self):
+        return self.read_u16() >> 4
+
+class BMP280Device:
+    """Register map of a BMP280 on the simulated I2C bus
+
+    Calibration words and raw readings default to the datasheet example used
+    by BMP280.load_test_calibration() and load_test_data(). A write of
+    forced mode to ctrl_meas runs one conversion and returns to sleep mode.
+    """
+
+    CALIBRATION = (27504, 26435, -1000, 36477, -10685, 3024, 2855, 140, -7, 15500, -14600, 6000)
+
+    def __init__(self, t_raw=519888, p_raw=415148):
+        self.regs = bytearray(256)
+        self.regs[0xD0] = 0x58 # chip id
+        struct_pack_into("<HhhHhhhhhhhh", self.regs, 0x88, *self.CALIBRATION)
+        self.t_raw = t_raw
+        self.p_raw = p_raw
+        self.conversions = 0
+        self.failed = False # Set to make the chip stop answering
+        self.convert()
+
+    def convert(self):
+        self.conversions = self.conversions + 1
+        p, t = self.p_raw, self.t_raw
+        self.regs[0xF7:0xFD] = bytes((p >> 12 & 0xFF, p >> 4 & 0xFF, (p & 0xF) << 4,
+                                      t >> 12 & 0xFF, t >> 4 & 0xFF, (t & 0xF) << 4))
+
+    def read(self, reg, n):
+        return bytes(self.regs[reg:reg + n])
+
+    def write(self, reg, data):
+        for i in range(len(data)):
+            self.regs[reg + i] = data[i]
+            if reg + i == 0xE0 and data[i] == 0xB6: # soft reset
+                self.regs[0xF4] = 0
+                self.regs[0xF5] = 0
+        mode = self.regs[0xF4] & 3
+        if reg <= 0xF4 < reg + len(data) and mode in (1, 2):
+            self.convert()
+            self.regs[0xF4] = self.regs[0xF4] & 0xFC # back to sleep
+        elif mode == 3:
+            self.convert()
+
+class I2C:
+    """I2C bus with simulated devices, counts transactions and bytes moved"""
+
+    # Devices created on every new bus, address: class
+    default_devices = {0x76: BMP280Device}
+
+    def __init__(self, id=0, scl=None, sda=None, freq=400000):
+        self.devices = {}
+        for addr in I2C.default_devices:
+            self.devices[addr] = I2C.default_devices[addr]()
+        self.transactions = 0
+        self.bytes = 0
+
+    def _device(self, addr):
+        self.transactions = self.transactions + 1
+        if addr not in self.devices or getattr(self.devices[addr], "failed", False):
+            raise OSError(19) # ENODEV
+        return self.devices[addr]
+
+    def scan(self):
+        self.transactions = self.transactions + len(range(0x08, 0x78))
+        return sorted(a for a in self.devices if getattr(self.devices[a], "failed", False) == False)
+
+    def readfrom_mem(self, addr, reg, n):
+        data = self._device(addr).read(reg, n)
+        self.bytes = self.bytes + n
+        return data
+
+    def readfrom_mem_into(self, addr, reg, buf):
+        data = self._device(addr).read(reg, len(buf))
+        buf[:] = data
+        self.bytes = self.bytes + len(buf)
+
+    def writeto_mem(self, addr, reg, buf):
+        self._device(addr).write(reg, buf)
+        self.bytes = self.bytes + len(buf)
+
+resets = 0
+
+def reset():
+    # Counted instead of restarting the host process
+    global resets
+    resets = resets + 1
+
+def soft_reset():
+    reset()
+
+def freq(hz=None):
+    return 160000000
+
+def unique_id():
+    return b"\x02\x00\x00\x00\x00\x02"
+
+def lightsleep(ms=None):
+    pass
+
+def deepsleep(ms=None):
+    pass
+
+class RTC:
+    """RTC memory that survives the simulated deep sleep"""
+
+    user_memory = b""
+
+    def memory(self, data=None):
+        if data == None:
+            return RTC.user_memory
+        RTC.user_memory = bytes(data)
@@ -0,0 +1,11 @@
+# Simulated micropython module
+
+def const(value):
+    return value
+
+# Code emitters, the decorated function runs as plain Python on a host
+def native(fn):
+    return fn
+
+def viper(fn):
+    return fn
@@ -0,0 +1,81 @@
+#
+# Fetch The Weather: Weather stations
+# Simulated network module
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+from ticks import ticks_ms, ticks_diff, ticks_add
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_GOT_IP = 1010
+
+class WLAN:
+    """Scripted Wi-Fi interface
+
+    Every connect() takes the next entry of script: the number of ms until
+    the connection is up, or None for an attempt that never succeeds. With
+    the script used up every attempt connects immediately. drop() simulates
+    the access point going away. clock can be replaced to drive the
+    interface from simulated time.
+    """
+
+    IF_STA = 0
+    IF_AP = 1
+
+    script = []
+    clock = staticmethod(ticks_ms)
+
+    def __init__(self, interface=IF_STA):
+        self.interface = interface
+        self._active = False
+        self.script = list(WLAN.script)
+        self.connected_at = None
+        self.connects = 0
+        self.joined = [] # bssid argument of every connect()
+        self.bssid = b"\x02\x00\x00\x00\x00\x01"
+        self.channel = 6
+
+    def active(self, value=None):
+        if value is None:
+            return self._active
+        self._active = value
+
+    def connect(self, ssid=None, key=None, bssid=None):
+        if not self._active:
+            raise OSError("Wifi Not Started")
+        self.connects = self.connects + 1
+        self.joined.append(bssid)
+        delay = self.script.pop(0) if len(self.script) > 0 else 0
+        if delay is None:
+            self.connected_at = None
+        else:
+            self.connected_at = ticks_add(WLAN.clock(), delay)
+
+    def disconnect(self):
+        self.connected_at = None
+
+    def drop(self):
+        self.connected_at = None
+
+    def isconnected(self):
+        return self.connected_at is not None and ticks_diff(WLAN.clock(), self.connected_at) >= 0
+
+    def status(self, param=None):
+        if param == "rssi":
+            return -60
+        return STAT_GOT_IP if self.isconnected() else STAT_IDLE
+
+    def config(self, *args, **kwargs):
+        if "channel" in kwargs:
+            self.channel = kwargs["channel"]
+        if len(args) > 0:
+            return {"channel": self.channel, "bssid": self.bssid, "mac": b"\x02\x00\x00\x00\x00\x02",
+                    "ssid": "sim"}[args[0]]
+
+    def ifconfig(self, *args):
+        return ("10.0.0.2", "255.255.255.0", "10.0.0.1", "10.0.0.1")
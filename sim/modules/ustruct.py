@@ -0,0 +1,2 @@
+# Simulated ustruct module, the host struct module has the same API
+from struct import *
@@ -0,0 +1,36 @@
+#
+# Fetch The Weather: Weather stations
+# Simulated station assembly
+# Copyright (c) 2025 FetchTheWeather
+#
+
+#
+# LICENSED UNDER THE MIT LICENSE
+#
+
+# Builds the station objects from main.py on top of the simulated hardware,
+# the same way main.py does at boot.
+
+import sim
+sim.install()
+
+import main
+from drivers import load, Scheduler
+
+def make_sensors(samples=9, trim=2):
+    sensors = [{"driver": "dht11", "pin": 4}, {"driver": "mq135", "pin": 26, "samples": samples, "trim": trim},
+               {"driver": "bmp280", "sda": 8, "scl": 9, "addr": 0x76}]
+    drivers, probe = load(sensors)
+    for driver in drivers:
+        driver.interval = 0 # Every collect() reads every sensor
+    return Scheduler(drivers)
+
+def make_config(station_id=1):
+    config = main.Config()
+    config.config["id"] = station_id
+    return config
+
+def make_data(station_id=1, sensors=None):
+    if sensors == None:
+        sensors = make_sensors()
+    return main.Data(sensors, make_config(station_id))